@@ -0,0 +1,279 @@
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.engine import Engine
+from models import Attempt, AttemptAnswer, QuestionStat, UserCategoryStat
+from write_behind import WriteBehind
+
+ANSWER_LETTERS = ("a", "b", "c", "d")
+
+
+def upsert_increments(conn, table, rows: List[dict], keys: List[str], counters: List[str]):
+    # Adds the counters of each row to the existing one, so aggregates are
+    # maintained incrementally instead of recounted from attempt_answers.
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={counter: table.c[counter] + statement.excluded[counter] for counter in counters},
+    )
+    conn.execute(statement, rows)
+
+
+class PendingBatch:
+    __slots__ = ("attempts", "answers", "question_stats", "user_stats")
+
+    def __init__(self):
+        self.attempts: List[dict] = []
+        self.answers: List[dict] = []
+        # (category, question_id) -> [answered, correct]
+        self.question_stats: Dict[Tuple[str, int], List[int]] = {}
+        # (user_id, category) -> [attempts, answered, correct]
+        self.user_stats: Dict[Tuple[str, str], List[int]] = {}
+
+    def __len__(self):
+        return len(self.attempts)
+
+    def merge(self, other: "PendingBatch"):
+        self.attempts[:0] = other.attempts
+        self.answers[:0] = other.answers
+        for key, (answered, correct) in other.question_stats.items():
+            current = self.question_stats.setdefault(key, [0, 0])
+            current[0] += answered
+            current[1] += correct
+        for key, (attempts, answered, correct) in other.user_stats.items():
+            current = self.user_stats.setdefault(key, [0, 0, 0])
+            current[0] += attempts
+            current[1] += answered
+            current[2] += correct
+
+
+class AttemptRecorder(WriteBehind):
+    # Write-behind: submit_test only appends to the pending batch, and a
+    # background task writes it in one transaction once flush_size attempts
+    # are queued or flush_interval seconds have passed.
+    def __init__(self, engine: Engine, flush_interval: float = 5.0, flush_size: int = 50,
+                 max_pending: int = 5000, enabled: bool = True):
+        super().__init__(flush_interval, enabled)
+        self.engine = engine
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        self.recorded = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.retried_reads = 0
+        # The batch being written, which is neither pending nor certainly in
+        # the tables yet, and counters that reads compare around their query.
+        self._flushing: Optional[PendingBatch] = None
+        self._flush_started = 0
+        self._flush_failures = 0
+        # Called as listener(question_stats, flushes) after each committed
+        # flush, with the batch's (category, question_id) -> [answered, correct].
+        self.listeners: List[Callable] = []
+        self._pending = PendingBatch()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def record(self, user_id: Optional[str], category: str, test_key: str, answers: Dict[int, Optional[str]],
+               answer_key: Dict[int, str]) -> Optional[str]:
+        if not self.enabled or not answers:
+            return None
+
+        attempt_id = uuid.uuid4().hex
+        correct = 0
+        rows = []
+        for question_id, answer in answers.items():
+            is_correct = int(answer == answer_key[question_id])
+            correct += is_correct
+            rows.append({
+                "attempt_id": attempt_id,
+                "question_id": question_id,
+                "answer": answer if answer in ANSWER_LETTERS else None,
+                "correct": is_correct,
+            })
+
+        with self._lock:
+            batch = self._pending
+            batch.attempts.append({
+                "id": attempt_id,
+                "user_id": user_id,
+                "category": category,
+                "test_key": test_key,
+                "score": correct,
+                "total": len(rows),
+                "created_at": time.time(),
+            })
+            batch.answers.extend(rows)
+            for row in rows:
+                stats = batch.question_stats.setdefault((category, row["question_id"]), [0, 0])
+                stats[0] += 1
+                stats[1] += row["correct"]
+            if user_id is not None:
+                stats = batch.user_stats.setdefault((user_id, category), [0, 0, 0])
+                stats[0] += 1
+                stats[1] += len(rows)
+                stats[2] += correct
+            self.recorded += 1
+            queued = len(batch)
+
+        if queued >= self.flush_size:
+            self.wake()
+        return attempt_id
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, PendingBatch()
+                if not batch:
+                    return 0
+                self._flushing = batch
+                self._flush_started += 1
+
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(Attempt), batch.attempts)
+                    conn.execute(insert(AttemptAnswer), batch.answers)
+                    upsert_increments(
+                        conn, QuestionStat.__table__,
+                        [
+                            {"category": category, "question_id": question_id, "answered": answered, "correct": correct}
+                            for (category, question_id), (answered, correct) in batch.question_stats.items()
+                        ],
+                        ["category", "question_id"], ["answered", "correct"],
+                    )
+                    if batch.user_stats:
+                        upsert_increments(
+                            conn, UserCategoryStat.__table__,
+                            [
+                                {"user_id": user_id, "category": category, "attempts": attempts,
+                                 "answered": answered, "correct": correct}
+                                for (user_id, category), (attempts, answered, correct) in batch.user_stats.items()
+                            ],
+                            ["user_id", "category"], ["attempts", "answered", "correct"],
+                        )
+            except Exception as e:
+                # Keep the batch for the next flush rather than failing
+                # submissions; past max_pending the oldest attempts are lost.
+                print(f"⚠️ Warning: attempts flush failed: {e}")
+                with self._lock:
+                    self._pending.merge(batch)
+                    if len(self._pending) > self.max_pending:
+                        self._drop_oldest(len(self._pending) - self.max_pending)
+                    self._flushing = None
+                    self._flush_failures += 1
+                return 0
+
+            with self._lock:
+                self.flushes += 1
+                self._flushing = None
+            for listener in self.listeners:
+                listener(batch.question_stats, self.flushes)
+            return len(batch)
+
+    def _drop_oldest(self, count: int):
+        # Aggregates already merged into the batch stay; only the raw rows
+        # of the oldest attempts are discarded.
+        dropped = {attempt["id"] for attempt in self._pending.attempts[:count]}
+        self._pending.attempts = self._pending.attempts[count:]
+        self._pending.answers = [row for row in self._pending.answers if row["attempt_id"] not in dropped]
+        self.dropped += count
+
+    def _read_consistent(self, read: Callable, finish: Callable, attempts: int = 3):
+        # The tables are read without any lock, so request handlers never
+        # wait behind a flush transaction and nothing blocks the event loop
+        # while run_sync awaits the query. read(marker) returns its rows and
+        # whether the attempt id marker, the first of the batch being
+        # flushed, was committed as seen by that same statement. finish(rows,
+        # flushes, uncommitted) then runs under the lock with the number of
+        # flushes the rows include and the in-flight batch they lack, if any.
+        # A flush that starts during the query swapped the pending batch, so
+        # the read is retried; past the last attempt it may miss that batch.
+        for attempt in range(attempts):
+            with self._lock:
+                started, failures, flushes, flushing = (
+                    self._flush_started, self._flush_failures, self.flushes, self._flushing
+                )
+            rows, committed = read(flushing.attempts[0]["id"] if flushing is not None else None)
+            with self._lock:
+                if self._flush_started == started or attempt == attempts - 1:
+                    # A batch that failed to flush is back in pending.
+                    if committed or self._flush_failures != failures:
+                        flushing = None
+                    return finish(rows, flushes + int(committed), flushing)
+            self.retried_reads += 1
+
+    @staticmethod
+    def _committed(marker: Optional[str]):
+        if marker is None:
+            return literal(0)
+        return select(func.count()).where(Attempt.id == marker).scalar_subquery()
+
+    @staticmethod
+    def _split_marker(rows) -> Tuple[list, bool]:
+        # Without rows the batch cannot concern this read: committing it
+        # would have created some.
+        rows = [tuple(row) for row in rows]
+        return [row[:-1] for row in rows], bool(rows and rows[0][-1])
+
+    def question_stats(self, db, category: str) -> Tuple[Dict[int, Tuple[int, int]], int]:
+        # question_id -> (answered, correct) as of the returned flush count;
+        # without a session (serving from a snapshot) only later flushes in
+        # this process are seen. A batch still being written is left to the
+        # listeners, which get it with a higher flush count.
+        if db is None:
+            return {}, self.flushes
+
+        def read(marker):
+            return self._split_marker(db.execute(
+                select(QuestionStat.question_id, QuestionStat.answered, QuestionStat.correct, self._committed(marker))
+                .where(QuestionStat.category == category)
+            ))
+
+        def finish(rows, flushes, uncommitted):
+            return {question_id: (answered, correct) for question_id, answered, correct in rows}, flushes
+
+        return self._read_consistent(read, finish)
+
+    def user_progress(self, db, user_id: str) -> Dict[str, List[int]]:
+        # category -> [attempts, answered, correct], including attempts that
+        # are queued or being written but not committed yet.
+        def read(marker):
+            return self._split_marker(db.execute(
+                select(
+                    UserCategoryStat.category, UserCategoryStat.attempts, UserCategoryStat.answered,
+                    UserCategoryStat.correct, self._committed(marker)
+                )
+                .where(UserCategoryStat.user_id == user_id)
+            ))
+
+        def finish(rows, flushes, uncommitted):
+            totals = {category: [attempts, answered, correct] for category, attempts, answered, correct in rows}
+            batches = [self._pending] if uncommitted is None else [uncommitted, self._pending]
+            for batch in batches:
+                for (pending_user, category), stats in batch.user_stats.items():
+                    if pending_user == user_id:
+                        current = totals.setdefault(category, [0, 0, 0])
+                        for i, value in enumerate(stats):
+                            current[i] += value
+            return totals
+
+        return self._read_consistent(read, finish)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "recorded": self.recorded,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "dropped": self.dropped,
+            "retried_reads": self.retried_reads,
+            "flush_interval": self.flush_interval,
+            "flush_size": self.flush_size,
+        }
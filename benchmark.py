@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from pathlib import Path
+
+SOURCE_DB = Path("web3informatyk.db")
+BASELINE_PATH = Path("benchmark_baseline.json")
+
+# name -> (method, path, json body); "submit" gets its body from a fresh test.
+SCENARIOS = {
+    "categories": ("GET", "/api/categories", None),
+    "test_40": ("GET", "/api/tests/inf02-40", None),
+    "test_weak": ("GET", "/api/tests/inf02-trudne", None),
+    "test_baza": ("GET", "/api/tests/inf02-baza", None),
+    "submit": ("POST", "/api/tests/submit", None),
+    "search": ("GET", "/api/search?q=siec", None),
+    "progress": ("GET", "/api/progress/bench", None),
+    "practice_profiles": ("GET", "/api/practice/profiles", None),
+    "practice_profile": ("GET", "/api/practice/profile/inf02", None),
+    "practice_archive": ("GET", "/api/practice/archive/inf02/1", None),
+    "download": ("GET", "/api/practice/download/inf02/1/arkusz", None),
+}
+
+
+def scale_database(path: Path, scale: int):
+    # Every question/archive is copied scale - 1 times under fresh ids, so
+    # the per-category and per-profile shapes stay the same, only bigger.
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            question_offset = conn.execute("SELECT MAX(id) FROM questions").fetchone()[0]
+            archive_offset = conn.execute("SELECT MAX(id) FROM practice_archives").fetchone()[0]
+            for copy in range(1, scale):
+                conn.execute(
+                    "INSERT INTO questions SELECT category, id + ?, question || ' #' || ?, image_url, "
+                    "answer_a, answer_b, answer_c, answer_d, correct_answer, explanation "
+                    "FROM questions WHERE id <= ?",
+                    (copy * question_offset, copy, question_offset)
+                )
+                conn.execute(
+                    "INSERT INTO practice_archives SELECT profile, id + ?, code || '-' || ?, date, year, type, downloaded "
+                    "FROM practice_archives WHERE id <= ?",
+                    (copy * archive_offset, copy, archive_offset)
+                )
+                conn.execute(
+                    "INSERT INTO practice_files SELECT profile, archive_id + ?, kind, url "
+                    "FROM practice_files WHERE archive_id <= ?",
+                    (copy * archive_offset, archive_offset)
+                )
+    finally:
+        conn.close()
+
+
+def prepare_database(workdir: Path, scale: int) -> Path:
+    path = workdir / f"bench-x{scale}.db"
+    shutil.copyfile(SOURCE_DB, path)
+    if scale > 1:
+        scale_database(path, scale)
+    return path
+
+
+def build_data_snapshot(db_path: Path, env: dict) -> Path:
+    path = db_path.with_suffix(".snapshot")
+    subprocess.run([sys.executable, "snapshot.py", "build", "-o", str(path)], env=env, check=True, stdout=subprocess.DEVNULL)
+    return path
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(client, name: str, requests: int, concurrency: int, measure_alloc: bool = True) -> dict:
+    method, path, body = SCENARIOS[name]
+    if name == "submit":
+        test = (await client.get("/api/tests/inf02-40")).json()
+        body = {
+            "category_code": "inf02-40",
+            "answers": {str(q["id"]): "a" for q in test["questions"]},
+            "token": test["token"],
+        }
+
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            # A distinct client address per request keeps the rate limiter in
+            # the measured path without it rejecting the load.
+            headers = {"x-forwarded-for": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"}
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Allocations are measured in a separate sequential pass so tracing does
+    # not distort the latency numbers. They can only be seen in-process.
+    peaks = []
+    if measure_alloc:
+        tracemalloc.start()
+        for _ in range(min(requests, 20)):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            await client.request(method, path, json=body, headers={"x-forwarded-for": "10.255.255.255"})
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+    return {
+        "requests": requests,
+        "statuses": {str(code): total for code, total in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "alloc_peak_kib": round(statistics.median(peaks) / 1024, 1) if peaks else None,
+    }
+
+
+async def run_benchmarks(scenarios: list, requests: int, concurrency: int, base_url: str = None) -> dict:
+    import httpx
+
+    results = {}
+    if base_url:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            for name in scenarios:
+                await run_scenario(client, name, min(requests, 20), concurrency, measure_alloc=False)
+                results[name] = await run_scenario(client, name, requests, concurrency, measure_alloc=False)
+        return results
+
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in scenarios:
+                # Warm caches (question bank, prerendered bodies, counts)
+                # so the numbers describe steady-state serving.
+                await run_scenario(client, name, min(requests, 20), 1)
+                results[name] = await run_scenario(client, name, requests, concurrency)
+    return results
+
+
+async def run_smoke(scenarios: list, concurrency: int) -> dict:
+    import httpx
+
+    from main import app
+
+    # Every scenario starts cold: concurrent requests all miss the caches
+    # at once, which is where a lock held across a query would deadlock.
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in scenarios:
+                method, path, _ = SCENARIOS[name]
+                if name == "submit":
+                    continue
+                responses = await asyncio.gather(*(
+                    client.request(method, path, headers={"x-forwarded-for": f"10.0.0.{i}"})
+                    for i in range(concurrency)
+                ))
+                statuses = {}
+                for response in responses:
+                    statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                results[name] = {"statuses": statuses}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> tuple:
+    regressions, unmeasured = [], []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            unmeasured.append(name)
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if result[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {result[metric]} ms > baseline {expected[metric]} ms")
+    return regressions, unmeasured
+
+
+def print_results(title: str, results: dict):
+    print(f"\n{title}")
+    print(f"{'scenario':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>9} {'alloc KiB':>10}  statuses")
+    for name, r in results.items():
+        print(
+            f"{name:<18} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+            f"{r['throughput_rps']:>9} {r['alloc_peak_kib'] or '-':>10}  {r['statuses']}"
+        )
+
+
+def start_server(env: dict, workers: int) -> tuple:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"uvicorn exited during startup with code {server.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            return server, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("uvicorn did not start within 60 s")
+
+
+def run_worker(options: dict, env: dict, timeout: float = None) -> dict:
+    # main reads its settings on import, so each scale runs in a fresh
+    # interpreter with its own DATABASE_URL.
+    try:
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", json.dumps(options)],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        # A blocked event loop cannot time itself out, so the deadline is
+        # enforced from outside.
+        raise SystemExit(f"worker did not finish within {timeout} s")
+    if result.returncode != 0:
+        sys.stderr.write(result.stdout + result.stderr)
+        raise SystemExit(result.returncode)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WEB3Informatyk API benchmark")
+    parser.add_argument("--scale", type=int, action="append", help="database scale factor (repeatable, default: 1 and 100)")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="default: all")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    parser.add_argument("--workers", type=int, default=0, help="serve with N uvicorn workers over HTTP instead of in-process")
+    parser.add_argument("--readonly", action="store_true", help="open the database with DATABASE_READONLY=immutable")
+    parser.add_argument("--snapshot", action="store_true", help="serve from a data snapshot built from the scaled database")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run with DATABASE_ASYNC=1")
+    parser.add_argument("--smoke", action="store_true", help="only check that concurrent cold requests all complete")
+    parser.add_argument("--smoke-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    scales = args.scale or ([1] if args.smoke else [1, 100])
+    scenarios = args.scenario or list(SCENARIOS)
+    workdir = Path(tempfile.mkdtemp(prefix="web3bench-"))
+    report = {}
+
+    try:
+        for scale in scales:
+            started = time.perf_counter()
+            db_path = prepare_database(workdir, scale)
+            print(f"x{scale}: prepared {db_path.name} in {time.perf_counter() - started:.1f} s")
+
+            env = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{db_path}",
+                "FRONTEND_URL": os.getenv("FRONTEND_URL", "http://localhost"),
+                "TEST_TOKEN_SECRET": os.getenv("TEST_TOKEN_SECRET", "benchmark"),
+                "RATE_LIMIT_STORAGE": "memory://",
+                "RATE_LIMIT_PROXY_HOPS": "1",
+            }
+            if args.readonly:
+                env["DATABASE_READONLY"] = "immutable"
+            if args.use_async:
+                env["DATABASE_ASYNC"] = "1"
+            if args.snapshot:
+                env["DATA_SNAPSHOT"] = str(build_data_snapshot(db_path, env))
+            options = {"scenarios": scenarios, "requests": args.requests, "concurrency": args.concurrency}
+            label = (
+                f"x{scale}" + (f"-w{args.workers}" if args.workers else "") + ("-ro" if args.readonly else "")
+                + ("-snap" if args.snapshot else "") + ("-async" if args.use_async else "")
+            )
+
+            if args.smoke:
+                results = run_worker({**options, "smoke": True}, env, timeout=args.smoke_timeout)
+                failed = {
+                    name: r["statuses"] for name, r in results.items()
+                    if any(not 200 <= int(code) < 400 for code in r["statuses"])
+                }
+                print(f"{label}: {len(results)} scenarios x {args.concurrency} concurrent cold requests")
+                if failed:
+                    raise SystemExit(f"❌ Failed requests: {failed}")
+                continue
+
+            if args.workers:
+                server, options["base_url"] = start_server(env, args.workers)
+                try:
+                    report[label] = run_worker(options, env)
+                finally:
+                    server.terminate()
+                    server.wait()
+            else:
+                report[label] = run_worker(options, env)
+            print_results(f"{label} ({args.requests} requests, concurrency {args.concurrency})", report[label])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.smoke:
+        print("\n✅ Every concurrent cold request completed")
+        return
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"\nbaseline written to {args.baseline}")
+        return
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions, unmeasured = [], []
+        for scale, results in report.items():
+            lines, names = compare(results, baseline.get(scale, {}), args.tolerance)
+            regressions += [f"{scale} {line}" for line in lines]
+            unmeasured += [f"{scale} {name}" for name in names]
+        if unmeasured:
+            # Not regressions, but not checked either; --save-baseline adds them.
+            print(f"\n⚠️ Warning: no baseline for {', '.join(unmeasured)}")
+        if regressions:
+            print("\n❌ Regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        options = json.loads(sys.argv[2])
+        if options.get("smoke"):
+            results = asyncio.run(run_smoke(options["scenarios"], options["concurrency"]))
+        else:
+            results = asyncio.run(run_benchmarks(
+                options["scenarios"], options["requests"], options["concurrency"], options.get("base_url")
+            ))
+        print(json.dumps(results))
+    else:
+        main()
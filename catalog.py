@@ -0,0 +1,104 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, List
+
+TEST_KEYWORDS = ("test", "pytań", "baza", "losowe")
+PRACTICE_KEYWORDS = ("praktyka", "arkusz", "egzamin")
+
+
+class SubstringIndex:
+    # A sorted suffix list: every substring of an indexed term is a prefix of
+    # one of its suffixes, so "query in term" becomes a bisect plus a short
+    # scan instead of a pass over every term.
+    def __init__(self):
+        self._suffixes = []
+
+    def add(self, text: str, key):
+        text = text.lower()
+        self._suffixes.extend((text[i:], key) for i in range(len(text)))
+
+    def freeze(self):
+        self._suffixes.sort()
+
+    def find(self, query: str) -> set:
+        keys = set()
+        i = bisect_left(self._suffixes, (query,))
+        while i < len(self._suffixes) and self._suffixes[i][0].startswith(query):
+            keys.add(self._suffixes[i][1])
+            i += 1
+        return keys
+
+
+def contains_keyword(query: str, keywords: Iterable[str]) -> bool:
+    return any(keyword in query for keyword in keywords)
+
+
+class Catalog:
+    def __init__(self, config: dict, category_aliases: Dict[str, str]):
+        self.category_order = [cat_info["code"] for cat_info in config["categories_info"]]
+        self.profile_order = list(config["practice_profiles_info"])
+        self.categories: Dict[str, dict] = {}
+        self.tests: Dict[str, List[dict]] = {code: [] for code in self.category_order}
+        icons = {cat_info["code"]: cat_info["icon"] for cat_info in config["categories_info"]}
+
+        for test_key, test_config in config["test_configs"].items():
+            code = category_aliases.get(test_config["base"].upper())
+            if code is None:
+                continue
+            self.tests[code].append({
+                "id": test_key,
+                "title": f"{test_config['title']} {test_config['name']}",
+                "category": test_key,
+                "categoryName": test_config["name"],
+                "type": "database" if test_config["count"] is None else "test",
+                "count": test_config["count"],
+                "icon": icons[code],
+            })
+
+        for cat_info in config["categories_info"]:
+            code = cat_info["code"]
+            baza = config["test_configs"].get(f"{cat_info['key']}-baza", cat_info)
+            self.categories[code] = {"name": baza["name"], "icon": cat_info["icon"], "key": cat_info["key"]}
+
+        self.category_index = SubstringIndex()
+        for code, cat_info in self.categories.items():
+            self.category_index.add(cat_info["name"], code)
+            self.category_index.add(cat_info["key"], code)
+        self.category_index.freeze()
+
+        self.profile_index = SubstringIndex()
+        for profile_id, profile_info in config["practice_profiles_info"].items():
+            for field in ("name", "title", "category", "description"):
+                self.profile_index.add(profile_info[field], profile_id)
+            self.profile_index.add(profile_id, profile_id)
+        self.profile_index.freeze()
+
+    def test_count(self, code: str) -> int:
+        return len(self.tests.get(code, ()))
+
+    def match_categories(self, query: str) -> List[str]:
+        query = query.lower()
+        if contains_keyword(query, TEST_KEYWORDS):
+            return list(self.category_order)
+        matched = self.category_index.find(query)
+        return [code for code in self.category_order if code in matched]
+
+    def match_profiles(self, query: str) -> List[str]:
+        query = query.lower()
+        if contains_keyword(query, PRACTICE_KEYWORDS):
+            return list(self.profile_order)
+        matched = self.profile_index.find(query)
+        return [profile_id for profile_id in self.profile_order if profile_id in matched]
+
+    def test_entries(self, code: str, total: int) -> List[dict]:
+        return [
+            {
+                "id": test["id"],
+                "title": test["title"],
+                "category": test["category"],
+                "categoryName": test["categoryName"],
+                "type": test["type"],
+                "questions": total if test["count"] is None else min(test["count"], total),
+                "icon": test["icon"],
+            }
+            for test in self.tests.get(code, ())
+        ]
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import marshal
+from pathlib import Path
+from typing import Tuple
+
+CONFIG_PATH = Path("config.json")
+SNAPSHOT_PATH = Path("config.snapshot")
+SNAPSHOT_VERSION = 1
+
+EMPTY_CONFIG = {
+    "categories_info": [],
+    "test_configs": {},
+    "practice_profiles_info": {}
+}
+
+CATEGORY_FIELDS = ("code", "key", "name", "icon")
+TEST_FIELDS = ("name", "title", "icon", "count", "base")
+# "random": uniform sample; "weak": weighted towards often-missed questions.
+TEST_MODES = ("random", "weak")
+PROFILE_FIELDS = ("id", "name", "title", "icon", "color", "category", "description")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _require(entry: dict, fields, where: str):
+    if not isinstance(entry, dict):
+        raise ConfigError(f"{where}: expected an object")
+    missing = [field for field in fields if field not in entry]
+    if missing:
+        raise ConfigError(f"{where}: missing {', '.join(missing)}")
+
+
+def validate_config(config: dict) -> dict:
+    for section, default in EMPTY_CONFIG.items():
+        if not isinstance(config.get(section), type(default)):
+            raise ConfigError(f"{section}: expected {type(default).__name__}")
+
+    aliases = set()
+    for i, cat_info in enumerate(config["categories_info"]):
+        _require(cat_info, CATEGORY_FIELDS, f"categories_info[{i}]")
+        aliases.add(cat_info["code"].replace(".", ""))
+        aliases.update(cat_info.get("aliases", []))
+
+    for key, test_config in config["test_configs"].items():
+        _require(test_config, TEST_FIELDS, f"test_configs.{key}")
+        count = test_config["count"]
+        if count is not None and (not isinstance(count, int) or count < 1):
+            raise ConfigError(f"test_configs.{key}: count must be a positive integer or null")
+        mode = test_config.get("mode", "random")
+        if mode not in TEST_MODES:
+            raise ConfigError(f"test_configs.{key}: mode must be one of {', '.join(TEST_MODES)}")
+        if mode == "weak" and count is None:
+            raise ConfigError(f"test_configs.{key}: weak tests need a count")
+        if test_config["base"].upper() not in aliases:
+            raise ConfigError(f"test_configs.{key}: unknown base {test_config['base']}")
+
+    for profile_id, profile_info in config["practice_profiles_info"].items():
+        _require(profile_info, PROFILE_FIELDS, f"practice_profiles_info.{profile_id}")
+
+    return config
+
+
+def build_snapshot(config_path: Path = CONFIG_PATH, snapshot_path: Path = SNAPSHOT_PATH) -> dict:
+    raw = config_path.read_bytes()
+    config = validate_config(json.loads(raw))
+    digest = hashlib.sha256(raw).hexdigest()
+    snapshot_path.write_bytes(marshal.dumps((SNAPSHOT_VERSION, digest, config)))
+    return config
+
+
+def load_versioned_config(config_path: Path = CONFIG_PATH, snapshot_path: Path = SNAPSHOT_PATH) -> Tuple[dict, str]:
+    # Returns the config and the SHA-256 of config.json, which also versions
+    # the responses rendered from it.
+    if not config_path.exists():
+        print("⚠️ Warning: config.json not found, using empty config")
+        return EMPTY_CONFIG, ""
+
+    raw = config_path.read_bytes()
+    raw_digest = hashlib.sha256(raw).hexdigest()
+
+    # The snapshot was validated when it was built; it is only trusted while
+    # it still matches config.json byte for byte.
+    if snapshot_path.exists():
+        try:
+            version, digest, config = marshal.loads(snapshot_path.read_bytes())
+            if version == SNAPSHOT_VERSION and digest == raw_digest:
+                return config, raw_digest
+        except (ValueError, EOFError, TypeError):
+            pass
+
+    return validate_config(json.loads(raw)), raw_digest
+
+
+def load_config(config_path: Path = CONFIG_PATH, snapshot_path: Path = SNAPSHOT_PATH) -> dict:
+    return load_versioned_config(config_path, snapshot_path)[0]
+
+
+if __name__ == "__main__":
+    built = build_snapshot()
+    print(
+        f"{SNAPSHOT_PATH}: {len(built['categories_info'])} categories, "
+        f"{len(built['test_configs'])} tests, "
+        f"{len(built['practice_profiles_info'])} practice profiles"
+    )
@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import union_all
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+
+class CountsRegistry:
+    # Each query selects (kind, name, total) rows, e.g.
+    # ("questions", "E.12", 917) or ("practice", "inf02", 28). A source
+    # callable returning the same mapping (e.g. a data snapshot's totals)
+    # replaces the queries.
+    def __init__(self, queries: Iterable, refresh_interval: Optional[float] = None,
+                 source: Optional[Callable[[], Dict[Tuple[str, str], int]]] = None):
+        self.queries = list(queries)
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.version = 0
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._refreshed_at: Optional[float] = None
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._stale = True
+
+    def _is_fresh(self) -> bool:
+        if self._stale or self._refreshed_at is None:
+            return False
+        if self.refresh_interval and time.monotonic() - self._refreshed_at > self.refresh_interval:
+            return False
+        return True
+
+    def refresh(self, db: Session):
+        if self.source is not None:
+            totals = self.source()
+        elif not self.queries:
+            return
+        else:
+            # One round trip for every source instead of a COUNT(*) per table.
+            query = union_all(*self.queries) if len(self.queries) > 1 else self.queries[0]
+            totals = {(kind, name): total for kind, name, total in db.execute(query)}
+
+        with self._lock:
+            if totals != self._counts:
+                self.version += 1
+            self._counts = totals
+            self._refreshed_at = time.monotonic()
+            self._stale = False
+            self.refreshes += 1
+
+    def snapshot(self, db: Session) -> Dict[Tuple[str, str], int]:
+        if self._is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+            with self._lock:
+                needs_refresh = not self._is_fresh()
+            if needs_refresh:
+                self.refresh(db)
+        # Refreshes swap in a new dict, so callers can read this one freely.
+        return self._counts
+
+    def get(self, db: Session, kind: str, name: str) -> int:
+        return self.snapshot(db).get((kind, name), 0)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        age = None
+        if self._refreshed_at is not None:
+            age = round(time.monotonic() - self._refreshed_at, 3)
+        return {
+            "age_seconds": age,
+            "refresh_interval": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "counts": {f"{kind}:{name}": count for (kind, name), count in self._counts.items()},
+        }
+
+
+class ContentDigest:
+    # The stored digest of every row the API serves (see data_digest.py), so
+    # cache versions follow the data itself: an edit that keeps the row
+    # counts (a reworded question, a moved file URL) still changes it, and
+    # every process over the same data agrees on it. load(db) reads it; it is
+    # read at startup and then in the background. A source callable
+    # returning the digest (e.g. a data snapshot's) replaces load.
+    def __init__(self, load: Callable[[Session], Optional[str]], refresh_interval: Optional[float] = None,
+                 source: Optional[Callable[[], str]] = None):
+        self.load = load
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.value = ""
+        self.refreshes = 0
+        self.changes = 0
+        # Called with no arguments whenever a refresh sees different data.
+        self.listeners: List[Callable] = []
+        self._refreshed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._warned = False
+
+    def refresh(self, db: Optional[Session]) -> bool:
+        if self.source is not None:
+            value = self.source()
+        else:
+            try:
+                value = self.load(db)
+            except Exception:
+                # e.g. a database from before the data_digest table; a later
+                # refresh keeps the last value instead (see _refresh_with).
+                if self.value:
+                    raise
+                value = None
+            if value is None:
+                # Versions then follow DATA_VERSION and the config only.
+                if not self._warned:
+                    print("⚠️ Warning: no stored data digest, run 'python migrate.py schema' to write one")
+                    self._warned = True
+                value = ""
+
+        changed = bool(self.value) and value != self.value
+        self.value = value
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+        if changed:
+            self.changes += 1
+            for listener in self.listeners:
+                listener()
+        return changed
+
+    def _refresh_with(self, session_factory: Callable):
+        db = session_factory()
+        try:
+            self.refresh(db)
+        except Exception as e:
+            print(f"⚠️ Warning: content digest refresh failed: {e}")
+        finally:
+            db.close()
+
+    async def run(self, session_factory: Callable):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await run_in_threadpool(self._refresh_with, session_factory)
+
+    def start(self, session_factory: Callable):
+        if self.source is None and self.refresh_interval and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run(session_factory))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        age = None
+        if self._refreshed_at is not None:
+            age = round(time.monotonic() - self._refreshed_at, 3)
+        return {
+            "digest": self.value[:16],
+            "age_seconds": age,
+            "refresh_interval": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "changes": self.changes,
+        }
@@ -0,0 +1,50 @@
+import hashlib
+import time
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+import models
+
+# The data digest is a SHA-256 over every row the API serves (except the
+# download counters, which change with traffic). Whatever writes those rows
+# (migrate.py, ingest.py) stores it in a single data_digest row, so the API
+# reads one row at startup instead of hashing the tables itself.
+DIGEST_ROW = 1
+
+# Every table the digest reads, for writers to create before stamping.
+TABLES = [
+    models.Question.__table__, models.PracticeArchive.__table__,
+    models.PracticeFile.__table__, models.DataDigest.__table__,
+]
+
+
+def content_queries() -> list:
+    return [
+        select(*models.Question.__table__.c).order_by(models.Question.category, models.Question.id),
+        select(*(c for c in models.PracticeArchive.__table__.c if c.name != "downloaded"))
+        .order_by(models.PracticeArchive.profile, models.PracticeArchive.id),
+        select(*models.PracticeFile.__table__.c)
+        .order_by(models.PracticeFile.profile, models.PracticeFile.archive_id, models.PracticeFile.kind),
+    ]
+
+
+def compute_digest(conn) -> str:
+    digest = hashlib.sha256()
+    for query in content_queries():
+        for row in conn.execute(query):
+            digest.update(repr(tuple(row)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def stamp(conn) -> str:
+    # Runs in the writer's transaction, so the digest commits with the rows.
+    value = compute_digest(conn)
+    conn.execute(delete(models.DataDigest).where(models.DataDigest.id == DIGEST_ROW))
+    conn.execute(insert(models.DataDigest).values(id=DIGEST_ROW, digest=value, updated_at=time.time()))
+    return value
+
+
+def read_digest(db: Session) -> Optional[str]:
+    return db.execute(select(models.DataDigest.digest).where(models.DataDigest.id == DIGEST_ROW)).scalar()
@@ -1,26 +1,189 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 import os
+from typing import Union
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "").lower() in ("1", "true", "yes")
+
+# "null": no pooling, for serverless instances that live for a few requests.
+# "pgbouncer": no pooling and no server-side prepared statements, for an
+#   external transaction-mode pooler in front of Postgres.
+# "queue": a local pool with pre-ping and recycling, for long-running uvicorn.
+DATABASE_POOL = os.getenv("DATABASE_POOL") or ("null" if os.getenv("VERCEL") else "queue")
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# "1"/"true": open the SQLite file with mode=ro. "immutable": additionally
+# promise SQLite the file never changes (the shipped web3informatyk.db), which
+# skips file locking and change detection entirely.
+DATABASE_READONLY = os.getenv("DATABASE_READONLY", "").lower()
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", str(64 * 1024)))
+# WAL is persisted in the database file itself, so it is only switched on
+# when asked for (SQLITE_JOURNAL_MODE=WAL) rather than rewriting the shipped file.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "").upper()
 
 connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+if IS_SQLITE:
+    connect_args = {
+        "check_same_thread": False,
+        "cached_statements": int(os.getenv("SQLITE_CACHED_STATEMENTS", "512")),
+    }
+
+
+def get_readonly_url(url: str, immutable: bool = False) -> str:
+    scheme, _, rest = url.partition(":///")
+    path, _, query = rest.partition("?")
+    params = [param for param in query.split("&") if param]
+    params += ["mode=ro", "uri=true"]
+    if immutable:
+        params.append("immutable=1")
+    return f"{scheme}:///file:{path}?{'&'.join(params)}"
+
+
+if IS_SQLITE and DATABASE_READONLY in ("1", "true", "yes", "immutable"):
+    DATABASE_URL = get_readonly_url(DATABASE_URL, immutable=DATABASE_READONLY == "immutable")
+    DATABASE_READONLY = True
+else:
+    DATABASE_READONLY = False
+
+
+def sqlite_pragmas(readonly: bool) -> list:
+    pragmas = [
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if readonly:
+        pragmas.append("PRAGMA query_only=1")
+        return pragmas
+    
+    pragmas.append("PRAGMA busy_timeout=5000")
+    if SQLITE_JOURNAL_MODE:
+        # WAL lets readers keep going while the ingest CLI or another worker
+        # writes to the same file.
+        pragmas.append(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        if SQLITE_JOURNAL_MODE == "WAL":
+            pragmas.append("PRAGMA synchronous=NORMAL")
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine):
+    pragmas = sqlite_pragmas(DATABASE_READONLY)
+
+    @event.listens_for(getattr(engine, "sync_engine", engine), "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def get_engine_options(pool: str, is_async: bool = False) -> dict:
+    if pool in ("null", "pgbouncer"):
+        options = {"poolclass": NullPool}
+        if pool == "pgbouncer" and is_async:
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    if pool == "queue":
+        return {
+            # aiosqlite would otherwise default to NullPool and reject the sizing options.
+            **({"poolclass": AsyncAdaptedQueuePool} if is_async else {}),
+            "pool_size": int(os.getenv("DATABASE_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW", "10")),
+            "pool_timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "30")),
+            "pool_recycle": int(os.getenv("DATABASE_POOL_RECYCLE", "1800")),
+            "pool_pre_ping": True,
+        }
+    raise ValueError(f"Unknown DATABASE_POOL: {pool}")
+
+
+def create_configured_engine(create, url: str, is_async: bool = False):
+    options = get_engine_options(DATABASE_POOL, is_async)
+    options["connect_args"] = {**connect_args, **options.get("connect_args", {})}
+    return create(url, **options)
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+
+engine = create_configured_engine(create_engine, DATABASE_URL)
+if IS_SQLITE:
+    apply_sqlite_pragmas(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+def get_async_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0], scheme)
+    if driver.endswith("asyncpg"):
+        # asyncpg takes "ssl" where libpq takes "sslmode".
+        rest = rest.replace("sslmode=", "ssl=")
+    return driver + separator + rest
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_configured_engine(create_async_engine, get_async_url(DATABASE_URL), is_async=True)
+    if IS_SQLITE:
+        apply_sqlite_pragmas(async_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+class SessionRunner:
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn, *args):
+        return await run_in_threadpool(fn, self.session, *args)
+
+
+class AsyncSessionRunner:
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn, *args):
+        # run_sync hands fn a regular Session whose I/O goes through the
+        # async driver, so no worker thread is held while waiting.
+        return await self.session.run_sync(fn, *args)
+
+
+DatabaseRunner = Union[SessionRunner, AsyncSessionRunner]
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_runner():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield AsyncSessionRunner(session)
+    else:
+        db = SessionLocal()
+        try:
+            yield SessionRunner(db)
+        finally:
+            db.close()
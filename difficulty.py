@@ -0,0 +1,118 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sampler import FenwickTree, QuestionFragment, draw_weighted
+
+WEIGHT_SCALE = 1_000_000
+BUILD_ATTEMPTS = 3
+
+
+def error_weight(answered: int, correct: int) -> int:
+    # Laplace-smoothed error rate: an unseen question weighs 1/2, one always
+    # answered wrong tends to 1 and one always answered right tends to 0,
+    # but never reaches it.
+    return (answered - correct + 1) * WEIGHT_SCALE // (answered + 2)
+
+
+class CategoryDifficulty:
+    __slots__ = ("bank", "positions", "stats", "tree", "generation", "loaded_at")
+
+    def __init__(self, bank, stats: Dict[int, Tuple[int, int]], generation: int):
+        self.bank = bank
+        self.positions = {fragment.id: i for i, fragment in enumerate(bank.fragments)}
+        self.stats = [list(stats.get(fragment.id, (0, 0))) for fragment in bank.fragments]
+        self.tree = FenwickTree([error_weight(answered, correct) for answered, correct in self.stats])
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+
+
+class DifficultyIndex:
+    # Per-category sampling weights for the "weak questions" tests. Each
+    # category is built once from the aggregated answer statistics, then
+    # kept current with a point update per question in every flushed batch.
+    def __init__(self, stats_source: Callable, refresh_interval: Optional[float] = None):
+        # stats_source(db, category) -> ({question_id: (answered, correct)}, flushes)
+        self.stats_source = stats_source
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.rebuilds = 0
+        # Highest flush count passed to apply(); an entry built from rows
+        # older than this has missed a batch.
+        self._applied = 0
+        self._entries: Dict[str, CategoryDifficulty] = {}
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, entry: Optional[CategoryDifficulty], bank) -> bool:
+        if entry is None or entry.bank is not bank:
+            return False
+        if self.refresh_interval and time.monotonic() - entry.loaded_at > self.refresh_interval:
+            return False
+        return True
+
+    def get(self, db, category: str, bank) -> CategoryDifficulty:
+        entry = self._entries.get(category)
+        if self._is_fresh(entry, bank):
+            self.hits += 1
+            return entry
+
+        # The refresh interval picks up batches flushed by other workers.
+        self.misses += 1
+        for _ in range(BUILD_ATTEMPTS):
+            stats, generation = self.stats_source(db, category)
+            entry = CategoryDifficulty(bank, stats, generation)
+            with self._lock:
+                # A batch applied between the read and here skipped this
+                # entry, which was not cached yet; read the rows again.
+                if generation >= self._applied:
+                    self._entries[category] = entry
+                    return entry
+            self.rebuilds += 1
+        # Still racing flushes: serve it this once, uncached.
+        return entry
+
+    def apply(self, question_stats: Dict[Tuple[str, int], List[int]], generation: int):
+        with self._lock:
+            self._applied = max(self._applied, generation)
+            # Entries loaded after this batch was committed already count it.
+            current = {
+                category: entry for category, entry in self._entries.items()
+                if entry.generation < generation
+            }
+            for (category, question_id), (answered, correct) in question_stats.items():
+                entry = current.get(category)
+                index = entry.positions.get(question_id) if entry is not None else None
+                if index is None:
+                    continue
+                stats = entry.stats[index]
+                stats[0] += answered
+                stats[1] += correct
+                entry.tree.set(index, error_weight(*stats))
+                self.updates += 1
+            for entry in current.values():
+                entry.generation = generation
+
+    def draw(self, entry: CategoryDifficulty, count: int, seed: int) -> List[Tuple[QuestionFragment, int]]:
+        with self._lock:
+            return draw_weighted(entry.bank.fragments, entry.tree, count, seed)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "refresh_interval": self.refresh_interval,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "updates": self.updates,
+            "rebuilds": self.rebuilds,
+            "categories": {
+                category: {
+                    "questions": entry.tree.size,
+                    "answered": sum(answered for answered, _ in entry.stats),
+                    "mean_error_rate": round(entry.tree.total / entry.tree.size / WEIGHT_SCALE, 4) if entry.tree.size else None,
+                }
+                for category, entry in self._entries.items()
+            },
+        }
@@ -0,0 +1,218 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.engine import Engine
+from models import PracticeArchive
+from write_behind import WriteBehind
+
+
+class CounterShard:
+    __slots__ = ("lock", "archives", "profiles")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (profile, archive_id) -> downloads not written yet
+        self.archives: Dict[Tuple[str, int], int] = {}
+        # profile -> the same downloads summed per profile
+        self.profiles: Dict[str, int] = {}
+
+
+class DownloadCounters(WriteBehind):
+    # Downloads are counted in memory, spread over shards by archive so
+    # concurrent increments rarely share a lock, and written to
+    # practice_archives.downloaded in one batched UPDATE per flush.
+    #
+    # Profile totals are running aggregates: the per-profile sums read once
+    # (and again every refresh_interval, to see other workers' writes), plus
+    # what this process has flushed since, plus what is still pending.
+    def __init__(self, engine: Engine, shards: int = 8, flush_interval: float = 10.0, flush_size: int = 200,
+                 refresh_interval: Optional[float] = None, totals_source: Optional[Callable] = None,
+                 enabled: bool = True):
+        super().__init__(flush_interval, enabled)
+        self.engine = engine
+        self.flush_size = flush_size
+        self.refresh_interval = refresh_interval
+        # totals_source() -> {profile: downloads} replaces the database sums,
+        # e.g. when serving from a snapshot; it is read once.
+        self.totals_source = totals_source
+        self.recorded = 0
+        self.flushes = 0
+        self.retried_loads = 0
+        self._shards = tuple(CounterShard() for _ in range(shards))
+        self._pending = 0
+        self._base: Optional[Dict[str, int]] = None
+        self._loaded_at: Optional[float] = None
+        # Flushed since _base was read, by profile and by archive.
+        self._flushed_profiles: Dict[str, int] = {}
+        self._flushed_archives: Dict[Tuple[str, int], int] = {}
+        # The counts being written, and how many flushes have started; a load
+        # compares them around its query.
+        self._flushing: Optional[Tuple[Dict[Tuple[str, int], int], Dict[str, int]]] = None
+        self._flush_started = 0
+        self._reload = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _shard(self, profile: str, archive_id: int) -> CounterShard:
+        return self._shards[hash((profile, archive_id)) % len(self._shards)]
+
+    def record(self, profile: str, archive_id: int):
+        if not self.enabled:
+            return
+
+        shard = self._shard(profile, archive_id)
+        with shard.lock:
+            shard.archives[(profile, archive_id)] = shard.archives.get((profile, archive_id), 0) + 1
+            shard.profiles[profile] = shard.profiles.get(profile, 0) + 1
+        self.recorded += 1
+        self._pending += 1
+
+        if self._pending >= self.flush_size:
+            self.wake()
+
+    def _pending_for(self, profile: str, archive_id: Optional[int] = None) -> int:
+        if archive_id is None:
+            return sum(shard.profiles.get(profile, 0) for shard in self._shards)
+        return self._shard(profile, archive_id).archives.get((profile, archive_id), 0)
+
+    def archive_downloads(self, profile: str, archive_id: int, stored: int) -> int:
+        # stored is the archive's downloaded column. Read from the database it
+        # already includes past flushes, but not the batch whose UPDATE is
+        # still running, so that one is added until the commit returns; with
+        # a static totals source (a snapshot) it is frozen, so this process's
+        # flushes are added. The lock spans a flush moving counts out of the
+        # shards, so they are never in neither place.
+        key = (profile, archive_id)
+        with self._lock:
+            downloads = (stored or 0) + self._pending_for(profile, archive_id)
+            if self.totals_source is not None:
+                downloads += self._flushed_archives.get(key, 0)
+            elif self._flushing is not None:
+                downloads += self._flushing[0].get(key, 0)
+        return downloads
+
+    def _is_fresh(self) -> bool:
+        if self._base is None or self._reload:
+            return False
+        if self.totals_source is not None:
+            return True
+        if self.refresh_interval and time.monotonic() - self._loaded_at > self.refresh_interval:
+            return False
+        return True
+
+    def _load(self, db):
+        if self.totals_source is not None:
+            base = self.totals_source()
+            with self._lock:
+                self._base = base
+                self._loaded_at = time.monotonic()
+            return
+
+        # Read without the flush lock, so a request never waits behind the
+        # UPDATE and nothing blocks the event loop while run_sync awaits the
+        # query. Only a read that no flush overlapped is known to contain
+        # exactly the flushes so far; otherwise the previous sums are kept,
+        # or on the first load the in-flight counts are taken as not yet
+        # written, and the next request reads again.
+        with self._lock:
+            started, flushing = self._flush_started, self._flushing
+        rows = db.execute(
+            select(PracticeArchive.profile, func.coalesce(func.sum(PracticeArchive.downloaded), 0))
+            .group_by(PracticeArchive.profile)
+        )
+        base = {profile: total for profile, total in rows}
+        with self._lock:
+            quiet = flushing is None and self._flush_started == started
+            if not quiet:
+                self.retried_loads += 1
+                self._reload = True
+                if self._base is not None:
+                    return
+            archives, profiles = self._flushing or ({}, {})
+            self._base = base
+            self._loaded_at = time.monotonic()
+            self._flushed_archives = {}
+            self._flushed_profiles = {}
+            self._merge_flushed(archives, profiles, 1)
+            self._reload = not quiet
+
+    def profile_totals(self, db) -> Dict[str, int]:
+        if not self._is_fresh():
+            self._load(db)
+        with self._lock:
+            profiles = set(self._base) | set(self._flushed_profiles)
+            return {
+                profile: self._base.get(profile, 0) + self._flushed_profiles.get(profile, 0) + self._pending_for(profile)
+                for profile in profiles
+            }
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            archives: Dict[Tuple[str, int], int] = {}
+            profiles: Dict[str, int] = {}
+            with self._lock:
+                for shard in self._shards:
+                    with shard.lock:
+                        shard_archives, shard.archives = shard.archives, {}
+                        shard_profiles, shard.profiles = shard.profiles, {}
+                    archives.update(shard_archives)
+                    for profile, count in shard_profiles.items():
+                        profiles[profile] = profiles.get(profile, 0) + count
+                if not archives:
+                    return 0
+                # Counted as flushed right away, so the totals never dip
+                # while the UPDATE runs.
+                self._merge_flushed(archives, profiles, 1)
+                self._pending = 0
+                self._flushing = (archives, profiles)
+                self._flush_started += 1
+
+            statement = (
+                update(PracticeArchive)
+                .where(PracticeArchive.profile == bindparam("key_profile"), PracticeArchive.id == bindparam("key_id"))
+                .values(downloaded=func.coalesce(PracticeArchive.downloaded, 0) + bindparam("delta"))
+            )
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(statement, [
+                        {"key_profile": profile, "key_id": archive_id, "delta": count}
+                        for (profile, archive_id), count in archives.items()
+                    ])
+            except Exception as e:
+                # Put the counts back for the next flush instead of losing them.
+                print(f"⚠️ Warning: download counters flush failed: {e}")
+                with self._lock:
+                    self._flushing = None
+                    self._merge_flushed(archives, profiles, -1)
+                    for (profile, archive_id), count in archives.items():
+                        shard = self._shard(profile, archive_id)
+                        with shard.lock:
+                            shard.archives[(profile, archive_id)] = shard.archives.get((profile, archive_id), 0) + count
+                            shard.profiles[profile] = shard.profiles.get(profile, 0) + count
+                        self._pending += count
+                return 0
+
+            with self._lock:
+                self._flushing = None
+                self.flushes += 1
+            return len(archives)
+
+    def _merge_flushed(self, archives: Dict[Tuple[str, int], int], profiles: Dict[str, int], sign: int):
+        for key, count in archives.items():
+            self._flushed_archives[key] = self._flushed_archives.get(key, 0) + sign * count
+        for profile, count in profiles.items():
+            self._flushed_profiles[profile] = self._flushed_profiles.get(profile, 0) + sign * count
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "shards": len(self._shards),
+            "recorded": self.recorded,
+            "pending": self._pending,
+            "flushes": self.flushes,
+            "retried_loads": self.retried_loads,
+            "flush_interval": self.flush_interval,
+            "flush_size": self.flush_size,
+        }
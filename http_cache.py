@@ -0,0 +1,93 @@
+import asyncio
+import functools
+import hashlib
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from prerendered import etag_matches
+from serialization import FastJSONResponse
+
+
+class HTTPCache:
+    def __init__(
+        self,
+        version: Callable[[], str],
+        max_age: int = 60,
+        s_maxage: int = 3600,
+        stale_while_revalidate: int = 86400,
+    ):
+        self.version = version
+        self.max_age = max_age
+        self.s_maxage = s_maxage
+        self.stale_while_revalidate = stale_while_revalidate
+
+    def headers(self, max_age: Optional[int] = None, s_maxage: Optional[int] = None) -> dict:
+        max_age = self.max_age if max_age is None else max_age
+        s_maxage = self.s_maxage if s_maxage is None else s_maxage
+        return {
+            "Cache-Control": (
+                f"public, max-age={max_age}, s-maxage={s_maxage}, "
+                f"stale-while-revalidate={self.stale_while_revalidate}"
+            )
+        }
+
+    def etag(self, request: Request) -> str:
+        # The ETag only depends on the data version and the URL, so a
+        # conditional request is answered before the handler runs.
+        query = "&".join(sorted(request.url.query.split("&")))
+        key = f"{self.version()}|{request.url.path}|{query}"
+        return '"v-{}"'.format(hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+
+    @staticmethod
+    def body_etag(body: bytes) -> str:
+        return '"b-{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+
+    def _finish(self, result, etag: str, headers: dict) -> Response:
+        if not isinstance(result, Response):
+            result = FastJSONResponse(result)
+        result.headers.update(headers)
+        result.headers["ETag"] = etag
+        return result
+
+    def _finish_from_body(self, request: Request, result, headers: dict) -> Response:
+        response = self._finish(result, "", headers)
+        etag = self.body_etag(response.body)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={**headers, "ETag": etag})
+        response.headers["ETag"] = etag
+        return response
+
+    def __call__(self, max_age: Optional[int] = None, s_maxage: Optional[int] = None, from_body: bool = False):
+        # from_body hashes the rendered response instead, for routes whose
+        # data changes between data versions (download counts). The handler
+        # always runs; a match only saves the transfer, but every worker
+        # agrees on the ETag of the same content.
+        def decorator(func):
+            headers = self.headers(max_age, s_maxage)
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, request: Request, **kwargs):
+                    if from_body:
+                        return self._finish_from_body(request, await func(*args, request=request, **kwargs), headers)
+                    etag = self.etag(request)
+                    if etag_matches(request, etag):
+                        return Response(status_code=304, headers={**headers, "ETag": etag})
+                    result = await func(*args, request=request, **kwargs)
+                    return self._finish(result, etag, headers)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, request: Request, **kwargs):
+                if from_body:
+                    return self._finish_from_body(request, func(*args, request=request, **kwargs), headers)
+                etag = self.etag(request)
+                if etag_matches(request, etag):
+                    return Response(status_code=304, headers={**headers, "ETag": etag})
+                result = func(*args, request=request, **kwargs)
+                return self._finish(result, etag, headers)
+
+            return wrapper
+
+        return decorator
@@ -0,0 +1,297 @@
+import argparse
+import contextlib
+import csv
+import json
+import sys
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from config import load_config
+from database import Base, engine
+import data_digest, models, schemas
+
+BATCH_SIZE = 500
+
+
+class IngestError(ValueError):
+    pass
+
+
+def open_input(path: str):
+    if path == "-":
+        # Read through, but left open for whoever owns it.
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def read_rows(path: str, fmt: str = None):
+    # Rows are yielded one at a time so large files never sit in memory.
+    fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+    with open_input(path) as f:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, {key: (value if value != "" else None) for key, value in row.items()}
+        else:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise IngestError(f"line {line_no}: invalid JSON ({e.msg})")
+
+
+def validate(model, line_no: int, row: dict):
+    try:
+        return model.model_validate(row)
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        )
+        raise IngestError(f"line {line_no}: {problems}")
+
+
+@contextlib.contextmanager
+def constraint_errors():
+    # Rows are checked before they are inserted, so this only catches what
+    # those checks do not know about; it still fails as a bad import rather
+    # than with a driver traceback.
+    try:
+        yield
+    except IntegrityError as e:
+        raise IngestError(f"constraint violated: {e.orig}")
+
+
+class IdAllocator:
+    # Questions and archives are keyed per category/profile, so new ids are
+    # handed out as max(id) + 1 within each group.
+    def __init__(self, conn, column, group_column):
+        self.conn = conn
+        self.column = column
+        self.group_column = group_column
+        self._existing = {}
+        self._next = {}
+
+    def _load(self, group: str):
+        if group not in self._existing:
+            ids = set(self.conn.execute(select(self.column).where(self.group_column == group)).scalars())
+            self._existing[group] = ids
+            self._next[group] = max(ids, default=0) + 1
+
+    def exists(self, group: str, id: int) -> bool:
+        self._load(group)
+        return id in self._existing[group]
+
+    def claim(self, group: str, id: int = None) -> int:
+        self._load(group)
+        if id is None:
+            id = self._next[group]
+        self._existing[group].add(id)
+        self._next[group] = max(self._next[group], id + 1)
+        return id
+
+
+def import_questions(rows, category: str = None, skip_existing: bool = False,
+                     batch_size: int = BATCH_SIZE, dry_run: bool = False):
+    known = {cat_info["code"] for cat_info in load_config()["categories_info"]}
+    Base.metadata.create_all(bind=engine, tables=data_digest.TABLES)
+    imported = {}
+    skipped = 0
+
+    # One transaction for the whole file: a bad row rolls everything back.
+    with constraint_errors(), engine.begin() as conn:
+        ids = IdAllocator(conn, models.Question.id, models.Question.category)
+        batch = []
+
+        for line_no, row in rows:
+            record = validate(schemas.QuestionImport, line_no, row)
+            row_category = record.category or category
+            if row_category not in known:
+                raise IngestError(f"line {line_no}: unknown category {row_category}")
+
+            if record.id is not None and ids.exists(row_category, record.id):
+                if skip_existing:
+                    skipped += 1
+                    continue
+                raise IngestError(f"line {line_no}: question {row_category}/{record.id} already exists")
+
+            batch.append({
+                **record.model_dump(exclude={"category", "id"}),
+                "category": row_category,
+                "id": ids.claim(row_category, record.id),
+            })
+            imported[row_category] = imported.get(row_category, 0) + 1
+
+            if len(batch) >= batch_size:
+                conn.execute(insert(models.Question), batch)
+                batch = []
+
+        if batch:
+            conn.execute(insert(models.Question), batch)
+        if dry_run:
+            conn.rollback()
+        elif imported:
+            data_digest.stamp(conn)
+
+    return imported, skipped
+
+
+def practice_row(row: dict) -> dict:
+    # Flat CSV/JSON rows carry files as <kind>_url columns, like the legacy tables.
+    files = dict(row.get("files") or {})
+    plain = {}
+    for key, value in row.items():
+        if key.endswith("_url"):
+            files[key[:-len("_url")]] = value
+        elif key != "files":
+            plain[key] = value
+    return {**plain, "files": files}
+
+
+def import_practice(rows, profile: str = None, skip_existing: bool = False,
+                    batch_size: int = BATCH_SIZE, dry_run: bool = False):
+    known = set(load_config()["practice_profiles_info"])
+    Base.metadata.create_all(bind=engine, tables=data_digest.TABLES)
+    imported = {}
+    skipped = 0
+
+    with constraint_errors(), engine.begin() as conn:
+        ids = IdAllocator(conn, models.PracticeArchive.id, models.PracticeArchive.profile)
+        codes = set(conn.execute(select(models.PracticeArchive.profile, models.PracticeArchive.code)).tuples())
+        kinds = {}
+        archives = []
+        files = []
+
+        for line_no, row in rows:
+            record = validate(schemas.PracticeArchiveImport, line_no, practice_row(row))
+            row_profile = record.profile or profile
+            if row_profile not in known:
+                raise IngestError(f"line {line_no}: unknown practice profile {row_profile}")
+
+            if record.id is not None and ids.exists(row_profile, record.id):
+                if skip_existing:
+                    skipped += 1
+                    continue
+                raise IngestError(f"line {line_no}: archive {row_profile}/{record.id} already exists")
+
+            # Archive codes are unique within a profile.
+            if (row_profile, record.code) in codes:
+                raise IngestError(f"line {line_no}: archive code {row_profile}/{record.code} already exists")
+            codes.add((row_profile, record.code))
+
+            if row_profile not in kinds:
+                kinds[row_profile] = set(conn.execute(
+                    select(models.PracticeFile.kind).where(models.PracticeFile.profile == row_profile).distinct()
+                ).scalars())
+
+            archive_id = ids.claim(row_profile, record.id)
+            archives.append({
+                **record.model_dump(exclude={"profile", "id", "files"}),
+                "profile": row_profile,
+                "id": archive_id,
+            })
+            # Missing kinds are stored as empty slots so every archive in a
+            # profile exposes the same file map.
+            for kind in sorted(kinds[row_profile] | set(record.files)):
+                files.append({
+                    "profile": row_profile,
+                    "archive_id": archive_id,
+                    "kind": kind,
+                    "url": record.files.get(kind),
+                })
+            imported[row_profile] = imported.get(row_profile, 0) + 1
+
+            if len(archives) >= batch_size:
+                conn.execute(insert(models.PracticeArchive), archives)
+                conn.execute(insert(models.PracticeFile), files)
+                archives = []
+                files = []
+
+        if archives:
+            conn.execute(insert(models.PracticeArchive), archives)
+            conn.execute(insert(models.PracticeFile), files)
+        if dry_run:
+            conn.rollback()
+        elif imported:
+            data_digest.stamp(conn)
+
+    return imported, skipped
+
+
+def export_questions(category: str, out, batch_size: int = BATCH_SIZE) -> int:
+    columns = [models.Question.category, *(
+        getattr(models.Question, name)
+        for name in ("id", "question", "image_url", "answer_a", "answer_b",
+                     "answer_c", "answer_d", "correct_answer", "explanation")
+    )]
+    query = select(*columns).where(models.Question.category == category).order_by(models.Question.id)
+    exported = 0
+
+    # stream_results + yield_per keep only one batch of rows in memory.
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for row in result:
+            out.write(json.dumps(dict(row._mapping), ensure_ascii=False))
+            out.write("\n")
+            exported += 1
+
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WEB3Informatyk bulk import/export")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="load questions or practice archives from JSONL/CSV")
+    importer.add_argument("table", choices=["questions", "practice"])
+    importer.add_argument("path", help="input file, '-' for stdin")
+    importer.add_argument("--format", choices=["jsonl", "csv"], help="defaults to the file extension")
+    importer.add_argument("--category", help="category code for rows without one, e.g. INF.02")
+    importer.add_argument("--profile", help="practice profile for rows without one, e.g. inf02")
+    importer.add_argument("--skip-existing", action="store_true", help="skip rows whose id already exists")
+    importer.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    importer.add_argument("--dry-run", action="store_true", help="validate and insert, then roll back")
+
+    exporter = commands.add_parser("export", help="write a question category as NDJSON")
+    exporter.add_argument("category", help="category code, e.g. INF.02")
+    exporter.add_argument("-o", "--output", help="output file (defaults to stdout)")
+    exporter.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                exported = export_questions(args.category, out, args.batch_size)
+        else:
+            exported = export_questions(args.category, sys.stdout, args.batch_size)
+        print(f"{args.category}: exported {exported} questions", file=sys.stderr)
+        return
+
+    rows = read_rows(args.path, args.format)
+    try:
+        if args.table == "questions":
+            imported, skipped = import_questions(
+                rows, args.category, args.skip_existing, args.batch_size, args.dry_run
+            )
+        else:
+            imported, skipped = import_practice(
+                rows, args.profile, args.skip_existing, args.batch_size, args.dry_run
+            )
+    except IngestError as e:
+        print(f"❌ Import failed, nothing was written: {e}", file=sys.stderr)
+        raise SystemExit(1)
+
+    action = "validated" if args.dry_run else "imported"
+    for group, total in imported.items():
+        print(f"{group}: {action} {total} {'questions' if args.table == 'questions' else 'archives'}")
+    if skipped:
+        print(f"skipped {skipped} existing rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+logger = logging.getLogger("web3informatyk")
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/tmp/web3informatyk-profiles"))
+
+# A profiler hooks the whole event loop thread, so concurrent requests would
+# replace each other's hook and profile each other's coroutines (and on
+# Python 3.12+ the second enable() raises). One sampled request at a time.
+_profiling = False
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    __slots__ = ("started", "statements", "db_seconds", "handler_done", "serialize_seconds")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.handler_done: Optional[float] = None
+        self.serialize_seconds = 0.0
+
+
+# The metrics object is shared by reference, so statements executed in the
+# threadpool (which copies the context) still add to the request's totals.
+current_metrics: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "current_metrics", default=None
+)
+
+
+class RouteStats:
+    __slots__ = ("requests", "errors", "duration", "buckets", "statements", "db_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.requests: Dict[str, int] = {}
+        self.errors = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.profiles_written = 0
+        self.profiles_skipped = 0
+
+    def record(self, method: str, route: str, status: int, duration: float, metrics: RequestMetrics):
+        # Only called from the event loop thread, so no locking is needed.
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        status = str(status)
+        stats.requests[status] = stats.requests.get(status, 0) + 1
+        stats.duration += duration
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                stats.buckets[i] += 1
+        stats.statements += metrics.statements
+        stats.db_seconds += metrics.db_seconds
+        stats.serialize_seconds += metrics.serialize_seconds
+
+    def record_exception(self, method: str, route: str):
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.errors += 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total Requests by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), stats in sorted(self.routes.items()):
+            for status, total in sorted(stats.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {total}')
+
+        lines += [
+            "# HELP http_request_duration_seconds Wall time per request.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), stats in sorted(self.routes.items()):
+            labels = f'method="{method}",route="{route}"'
+            for bound, total in zip(DURATION_BUCKETS, stats.buckets):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {total}')
+            count = sum(stats.requests.values())
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+        for name, help_text, kind, attr in (
+            ("db_statements_total", "SQL statements executed.", "counter", "statements"),
+            ("db_duration_seconds_total", "Time spent executing SQL.", "counter", "db_seconds"),
+            ("serialize_duration_seconds_total", "Time spent encoding responses.", "counter", "serialize_seconds"),
+            ("http_exceptions_total", "Unhandled exceptions turned into 500s.", "counter", "errors"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (method, route), stats in sorted(self.routes.items()):
+                value = getattr(stats, attr)
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{name}{{method="{method}",route="{route}"}} {value}')
+
+        lines += [
+            "# HELP profiles_written_total cProfile dumps written for slow requests.",
+            "# TYPE profiles_written_total counter",
+            f"profiles_written_total {self.profiles_written}",
+            "# HELP profiles_skipped_total Sampled requests not profiled because another one was.",
+            "# TYPE profiles_skipped_total counter",
+            f"profiles_skipped_total {self.profiles_skipped}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def instrument_engine(engine):
+    # Async engines expose their events on the wrapped sync engine.
+    engine = getattr(engine, "sync_engine", engine)
+
+    # The start time lives on the statement's execution context, which is
+    # discarded with it, so statements that fail (after_cursor_execute never
+    # fires) leave nothing behind on the pooled connection.
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = context._query_started
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.statements += 1
+            metrics.db_seconds += time.perf_counter() - started
+
+
+@contextmanager
+def timed_serialization():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.serialize_seconds += time.perf_counter() - started
+
+
+def route_name(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def record_exception(request):
+    # Handlers turn unexpected errors into a plain 500; keep the traceback
+    # and count it against the route.
+    logger.exception("Unhandled error in %s %s", request.method, request.url.path)
+    registry.record_exception(request.method, route_name(request.scope))
+
+
+class InstrumentedRoute(APIRoute):
+    # Marks when the endpoint returns, so the time FastAPI spends validating
+    # and encoding the result can be reported as serialization.
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+    def matches(self, scope):
+        match, child_scope = super().matches(scope)
+        child_scope["route"] = self
+        return match, child_scope
+
+
+def timed_endpoint(func):
+    if not asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                mark_handler_done()
+
+        return wrapper
+
+    @functools.wraps(func)
+    async def async_wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            mark_handler_done()
+
+    return async_wrapper
+
+
+def mark_handler_done():
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.handler_done = time.perf_counter()
+
+
+def server_timing(metrics: RequestMetrics, total: float) -> str:
+    return ", ".join((
+        f'db;dur={metrics.db_seconds * 1000:.2f};desc="{metrics.statements} queries"',
+        f"serialize;dur={metrics.serialize_seconds * 1000:.2f}",
+        f"total;dur={total * 1000:.2f}",
+    ))
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        status = 500
+        profiler = start_profile() if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE else None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                now = time.perf_counter()
+                if metrics.handler_done is not None:
+                    metrics.serialize_seconds += now - metrics.handler_done
+                    metrics.handler_done = None
+                if SERVER_TIMING:
+                    header = server_timing(metrics, now - metrics.started)
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - metrics.started
+            current_metrics.reset(token)
+            route = route_name(scope)
+            registry.record(scope["method"], route, status, duration, metrics)
+            if profiler is not None:
+                stop_profile(profiler)
+                if duration * 1000 >= PROFILE_SLOW_MS:
+                    dump_profile(profiler, scope["method"], route, duration)
+
+
+def start_profile() -> Optional[cProfile.Profile]:
+    global _profiling
+    if _profiling:
+        registry.profiles_skipped += 1
+        return None
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Some other profiler (a debugger, coverage) owns the hook.
+        registry.profiles_skipped += 1
+        return None
+    _profiling = True
+    return profiler
+
+
+def stop_profile(profiler: cProfile.Profile):
+    global _profiling
+    profiler.disable()
+    _profiling = False
+
+
+def dump_profile(profiler: cProfile.Profile, method: str, route: str, duration: float):
+    # Only the event loop thread is profiled; queries run in the threadpool
+    # show up through the db metrics instead.
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        slug = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        path = PROFILE_DIR / f"{int(time.time() * 1000)}-{method}-{slug}-{duration * 1000:.0f}ms.prof"
+        profiler.dump_stats(path)
+        registry.profiles_written += 1
+    except OSError as e:
+        print(f"⚠️ Warning: could not write profile: {e}")
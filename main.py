@@ -1,40 +1,131 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+import time
+
+STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from dotenv import load_dotenv 
+from sqlalchemy import func, literal, select, tuple_
+import functools
 import os 
-import random
-import json
-from pathlib import Path
-
-from database import get_db, Base, engine
-import models, schemas
-
-load_dotenv()
-
-Base.metadata.create_all(bind=engine)
-
-CONFIG = {}
-config_path = Path("config.json")
-if config_path.exists():
-    with open(config_path, "r", encoding="utf-8") as f:
-        CONFIG = json.load(f)
-else:
-    print("⚠️ Warning: config.json not found, using empty config")
-    CONFIG = {
-        "categories_info": [],
-        "test_configs": {},
-        "practice_profiles_info": {}
-    }
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from database import DATABASE_POOL, DATABASE_READONLY, DatabaseRunner, get_runner, async_engine, engine, SessionLocal
+from attempts import AttemptRecorder
+from catalog import Catalog
+from config import load_versioned_config
+from counts import ContentDigest, CountsRegistry
+from difficulty import DifficultyIndex
+from downloads import DownloadCounters
+from pagination import InvalidCursor, after_cursor, decode_cursor, encode_cursor
+from http_cache import HTTPCache
+from prerendered import PrerenderedCache, prerendered_response
+from question_bank import QuestionBank
+from test_token import InvalidToken, TestTokenSigner
+from search_index import SearchIndex, search_archives, search_questions_like
+from serialization import FastJSONResponse
+from snapshot import SnapshotRunner, load_snapshot
+import data_digest, instrumentation, models, rate_limit, sampler, schemas
+
+CONFIG, CONFIG_DIGEST = load_versioned_config()
+
+# With a data snapshot, questions, counts, search and practice archives are
+# read from the mapped file and the database is never connected to.
+data_snapshot = load_snapshot(os.getenv("DATA_SNAPSHOT"))
+
+question_bank = QuestionBank(
+    ttl=float(os.getenv("QUESTION_BANK_TTL", "3600")),
+    loader=data_snapshot.category_records if data_snapshot else None
+)
+
+TEST_TOKEN_SECRET = os.getenv("TEST_TOKEN_SECRET")
+if not TEST_TOKEN_SECRET:
+    # Shuffled tests can only be graded from their token, so a secret that
+    # differs between instances breaks submit whenever a test is fetched
+    # from one and submitted to another.
+    if os.getenv("VERCEL") or int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        raise RuntimeError("TEST_TOKEN_SECRET must be set when running on Vercel or with several workers")
+    print("⚠️ Warning: TEST_TOKEN_SECRET not set, test tokens are only valid in this process")
+    TEST_TOKEN_SECRET = secrets.token_hex(32)
+
+token_signer = TestTokenSigner(
+    TEST_TOKEN_SECRET.encode("utf-8"),
+    max_age=int(os.getenv("TEST_TOKEN_MAX_AGE", "86400"))
+)
+
+# The rendered "baza" bodies carry no token (see build_test_response), so
+# they only change with the bank they were built from.
+prerendered = PrerenderedCache()
+
+# Submitted answers are queued in memory and written in batches; a read-only
+# database has nowhere to put them.
+attempt_recorder = AttemptRecorder(
+    engine,
+    flush_interval=float(os.getenv("ATTEMPTS_FLUSH_INTERVAL", "5")),
+    flush_size=int(os.getenv("ATTEMPTS_FLUSH_SIZE", "50")),
+    enabled=not DATABASE_READONLY
+)
+
+difficulty = DifficultyIndex(
+    attempt_recorder.question_stats,
+    refresh_interval=float(os.getenv("DIFFICULTY_REFRESH_INTERVAL", "300"))
+)
+attempt_recorder.listeners.append(difficulty.apply)
+
+download_counters = DownloadCounters(
+    engine,
+    shards=int(os.getenv("DOWNLOADS_SHARDS", "8")),
+    flush_interval=float(os.getenv("DOWNLOADS_FLUSH_INTERVAL", "10")),
+    flush_size=int(os.getenv("DOWNLOADS_FLUSH_SIZE", "200")),
+    refresh_interval=float(os.getenv("DOWNLOADS_REFRESH_INTERVAL", "300")),
+    totals_source=data_snapshot.download_totals if data_snapshot else None,
+    enabled=not DATABASE_READONLY
+)
+
+
+STARTUP_TIMINGS = {}
 
-limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
-app = FastAPI(title="WEB3Informatyk API", version="1.0.0")
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if data_snapshot is not None:
+        counts.refresh(None)
+        content_digest.refresh(None)
+    else:
+        db = SessionLocal()
+        try:
+            counts.refresh(db)
+            digest_started = time.perf_counter()
+            content_digest.refresh(db)
+            STARTUP_TIMINGS["digest_ms"] = round((time.perf_counter() - digest_started) * 1000, 1)
+        finally:
+            db.close()
+        search_index.ensure(engine)
+    content_digest.start(SessionLocal)
+    attempt_recorder.start()
+    download_counters.start()
+    
+    STARTUP_TIMINGS["ready_ms"] = round((time.perf_counter() - STARTED_AT) * 1000, 1)
+    print(
+        f"⏱️ Startup: import {STARTUP_TIMINGS['import_ms']} ms, "
+        f"ready {STARTUP_TIMINGS['ready_ms']} ms (pool: {DATABASE_POOL})"
+    )
+    yield
+    await content_digest.stop()
+    await attempt_recorder.stop()
+    await download_counters.stop()
+    if async_engine is not None:
+        # aiosqlite keeps a thread per pooled connection, which would hold
+        # the process open after shutdown.
+        await async_engine.dispose()
+
+
+app = FastAPI(title="WEB3Informatyk API", version="1.0.0", lifespan=lifespan)
+app.router.route_class = instrumentation.InstrumentedRoute
 
 FRONTEND_URLS = os.getenv("FRONTEND_URL").split(",")
 
@@ -47,88 +138,220 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(instrumentation.InstrumentationMiddleware)
+
+instrumentation.instrument_engine(engine)
+if async_engine is not None:
+    instrumentation.instrument_engine(async_engine)
 
-CATEGORY_MODELS = {
-    "E.12": models.QuestionE12,
-    "E.13": models.QuestionE13,
-    "INF.02": models.QuestionINF02,
-    "INF.03": models.QuestionINF03,
-    "INF.04": models.QuestionINF04,
+CATEGORIES = {
+    cat_info["code"]: cat_info
+    for cat_info in CONFIG["categories_info"]
 }
 
-PRACTICE_MODELS = {
-    'inf02': models.PracticeINF02,
-    'ee08': models.PracticeEE08,
-    'e12': models.PracticeE12,
-    'e13': models.PracticeE13,
-    'inf03': models.PracticeINF03,
-    'ee09': models.PracticeEE09,
-    'e14': models.PracticeE14,
-    'inf04': models.PracticeINF04,
+CATEGORY_ALIASES = {
+    alias: cat_info["code"]
+    for cat_info in CONFIG["categories_info"]
+    for alias in [cat_info["code"].replace('.', ''), *cat_info.get("aliases", [])]
 }
 
+search_index = SearchIndex()
+
+catalog = Catalog(CONFIG, CATEGORY_ALIASES)
+
+counts = CountsRegistry(
+    [
+        select(literal("questions"), models.Question.category, func.count())
+        .group_by(models.Question.category),
+        select(literal("practice"), models.PracticeArchive.profile, func.count())
+        .group_by(models.PracticeArchive.profile),
+    ],
+    refresh_interval=float(os.getenv("COUNTS_REFRESH_INTERVAL", "300")),
+    source=data_snapshot.totals if data_snapshot else None,
+)
+
+
+content_digest = ContentDigest(
+    data_digest.read_digest,
+    refresh_interval=float(os.getenv("CONTENT_DIGEST_REFRESH_INTERVAL", "300")),
+    source=(lambda: data_snapshot.digest) if data_snapshot else None,
+)
+# Reloaded banks also rebuild the prerendered "baza" bodies built from them.
+content_digest.listeners.append(question_bank.bump_version)
+content_digest.listeners.append(counts.invalidate)
+
+DATA_VERSION = os.getenv("DATA_VERSION", "1")
+
+
+async def get_data_runner():
+    if data_snapshot is not None:
+        yield SnapshotRunner()
+    else:
+        async for runner in get_runner():
+            yield runner
+
+
+def content_version():
+    # Categories and test lists come from config.json, so a config-only
+    # deploy changes the version as well.
+    return f"{DATA_VERSION}.{CONFIG_DIGEST[:16]}.{content_digest.value[:32]}"
+
 
-def get_model_by_code(category_code: str):
+http_cache = HTTPCache(
+    version=content_version,
+    max_age=int(os.getenv("CACHE_MAX_AGE", "60")),
+    s_maxage=int(os.getenv("CACHE_S_MAXAGE", "3600")),
+)
+
+
+def get_category_by_code(category_code: str):
     code = category_code.upper().replace('-', '.').split('.')[0]
+    return CATEGORY_ALIASES.get(code)
+
+
+def build_test_response(config: dict, category: str, bank, seed: Optional[int], weights=None):
+    if weights is None:
+        formatted_questions = sampler.render_test(bank.fragments, config["count"], seed)
+    else:
+        formatted_questions = [
+            sampler.render(fragment, order)
+            for fragment, order in difficulty.draw(weights, config["count"], seed)
+        ]
     
-    model_map = {
-        "E12": models.QuestionE12,
-        "E": models.QuestionE12,
-        "E13": models.QuestionE13,
-        "INF02": models.QuestionINF02,
-        "EE08": models.QuestionINF02,
-        "INF03": models.QuestionINF03,
-        "EE09": models.QuestionINF03,
-        "INF03EE09E14": models.QuestionINF03,
-        "INF04": models.QuestionINF04,
+    response = {
+        "name": config["name"],
+        "title": config["title"],
+        "icon": config["icon"],
+        "questions": formatted_questions,
+        "seed": seed
     }
     
-    return model_map.get(code)
+    # Unshuffled "baza" tests (no seed) are graded from the bank on submit.
+    # A token carries its issue time, which would make their cached bodies
+    # and ETags differ per instance and outlive the token at the edge.
+    if seed is not None:
+        response["token"] = token_signer.issue(
+            category,
+            [q["id"] for q in formatted_questions],
+            "".join(q["correctAnswer"] for q in formatted_questions)
+        )
+    
+    return response
 
 
-def shuffle_answers(question, shuffle: bool = True):
-    answers = [
-        {"id": "a", "text": question.answer_a, "original": "a"},
-        {"id": "b", "text": question.answer_b, "original": "b"},
-        {"id": "c", "text": question.answer_c, "original": "c"},
-        {"id": "d", "text": question.answer_d, "original": "d"},
-    ]
+ARCHIVE_FIELDS = ("id", "code", "date", "year", "type", "downloaded", "files")
+
+ARCHIVE_ORDER = (
+    (models.PracticeArchive.year, True),
+    (models.PracticeArchive.date, True),
+    (models.PracticeArchive.id, False),
+)
+
+
+def query_archives(db: Session, profile_id: str, archive_id=None, after=None, columns=("code", "type", "downloaded"), kinds=None, with_files=True, limit=None):
+    if data_snapshot is not None:
+        return data_snapshot.archives(profile_id, archive_id, after, columns, kinds, with_files, limit)
     
-    if shuffle:
-        random.shuffle(answers)
-        
-        correct_answer = None
-        for i, ans in enumerate(answers):
-            if ans["original"] == question.correct_answer:
-                correct_answer = chr(97 + i)
-                break
-        
-        for i, ans in enumerate(answers):
-            ans["id"] = chr(97 + i)
-            del ans["original"]
-    else:
-        correct_answer = question.correct_answer
-        for ans in answers:
-            del ans["original"]
+    archive = models.PracticeArchive
+    practice_file = models.PracticeFile
+    
+    conditions = [archive.profile == profile_id]
+    if archive_id is not None:
+        conditions.append(archive.id == archive_id)
+    if after is not None:
+        conditions.append(after_cursor(ARCHIVE_ORDER, after))
+    
+    query = (
+        select(archive.profile, archive.id, archive.year, archive.date, *(getattr(archive, c) for c in columns))
+        .where(*conditions)
+        .order_by(*(column.desc() if descending else column for column, descending in ARCHIVE_ORDER))
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    
+    archives = {}
+    for row in db.execute(query):
+        archives[(row.profile, row.id)] = {**row._mapping, 'files': {}}
+    
+    # Files are fetched for the selected archives only, so a page never
+    # multiplies its rows by the number of file kinds.
+    if with_files and archives:
+        file_query = select(
+            practice_file.profile, practice_file.archive_id, practice_file.kind, practice_file.url
+        ).where(
+            tuple_(practice_file.profile, practice_file.archive_id).in_(list(archives))
+        ).order_by(practice_file.kind)
+        if kinds is not None:
+            file_query = file_query.where(practice_file.kind.in_(kinds))
+        for row in db.execute(file_query):
+            archives[(row.profile, row.archive_id)]['files'][row.kind] = row.url
+    
+    return list(archives.values())
+
+
+def query_archive_summary(db: Session, profile_id: str):
+    downloads = download_counters.profile_totals(db).get(profile_id, 0)
+    if data_snapshot is not None:
+        return len(data_snapshot.archive_ids(profile_id)), downloads
+    
+    count = db.execute(
+        select(func.count()).where(models.PracticeArchive.profile == profile_id)
+    ).scalar()
+    return count, downloads
+
+
+def parse_archive_fields(fields: Optional[str]):
+    if fields is None:
+        return set(ARCHIVE_FIELDS), None
+    
+    selected = set()
+    kinds = set()
+    for field in (f.strip() for f in fields.split(",")):
+        if field.startswith("files."):
+            kinds.add(field[len("files."):])
+        elif field in ARCHIVE_FIELDS:
+            selected.add(field)
+        elif field:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+    
+    # "files.arkusz" narrows the file map to the listed kinds; a plain
+    # "files" keeps every kind.
+    if kinds and "files" not in selected:
+        return selected | {"id", "files"}, sorted(kinds)
+    return selected | {"id"}, None
+
+
+def find_questions(db: Session, query: str, categories: list):
+    if data_snapshot is not None:
+        return data_snapshot.search_questions(categories, query)
     
-    return answers, correct_answer
+    hits = search_index.search(db, query)
+    if hits is None:
+        hits = search_questions_like(db, categories, query)
+    return hits
+
 
+def find_archives(db: Session, profiles: list, query: str):
+    if data_snapshot is not None:
+        return data_snapshot.search_archives(profiles, query)
+    return search_archives(db, profiles, query)
 
-def format_question(question, shuffle_mode: bool = True):
-    answers, correct_answer = shuffle_answers(question, shuffle=shuffle_mode)
+
+def format_search_question(question_id: int, question_text: str, cat_info: dict):
+    if len(question_text) > 100:
+        question_text = question_text[:100] + "..."
     
     return {
-        "id": question.id,
-        "question": question.question,
-        "image": question.image_url,
-        "answers": answers,
-        "correctAnswer": correct_answer,
-        "explanation": question.explanation or ""
+        "id": question_id,
+        "question": question_text,
+        "category": f"{cat_info['key']}-baza",
+        "categoryName": cat_info["name"],
+        "icon": cat_info["icon"]
     }
 
 
 @app.get("/")
-def root():
+async def root():
     return {
         "message": "WEB3Informatyk API",
         "status": "online",
@@ -136,23 +359,56 @@ def root():
     }
 
 
+@app.get("/api/stats/cache")
+@rate_limit.limit("30/minute")
+async def get_cache_stats(request: Request):
+    return {
+        "startup": STARTUP_TIMINGS,
+        "counts": counts.stats(),
+        "content_digest": content_digest.stats(),
+        "question_bank": question_bank.stats(),
+        "rate_limit": rate_limit.limiter.stats(),
+        "attempts": attempt_recorder.stats(),
+        "difficulty": difficulty.stats(),
+        "downloads": download_counters.stats(),
+        "snapshot": data_snapshot.stats() if data_snapshot else None
+    }
+
+
+# Route names, error counts and timings are not for the public: the
+# endpoint only exists when METRICS_TOKEN is set, and scrapers send it as a
+# bearer token.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = request.headers.get("authorization", "")
+    if not secrets.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(instrumentation.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/categories")
-@limiter.limit("30/minute")
-def get_categories(request: Request, db: Session = Depends(get_db)):
+@http_cache()
+@rate_limit.limit("30/minute")
+async def get_categories(request: Request, db: DatabaseRunner = Depends(get_data_runner)):
     try:
+        totals = await db.run(counts.snapshot)
         result = []
         total_count = 0
         
         for cat_info in CONFIG["categories_info"]:
-            model = CATEGORY_MODELS[cat_info["code"]]
-            count = db.query(model).count()
+            count = totals.get(("questions", cat_info["code"]), 0)
             
             result.append({
                 "code": cat_info["code"],
                 "name": cat_info["name"],
                 "icon": cat_info["icon"],
                 "question_count": count,
-                "test_count": 4
+                "test_count": catalog.test_count(cat_info["code"])
             })
             
             total_count += count
@@ -162,12 +418,13 @@ def get_categories(request: Request, db: Session = Depends(get_db)):
             "total_questions": total_count
         }
     except Exception:
+        instrumentation.record_exception(request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.get("/api/tests/{category_code}", response_model=schemas.TestResponse)
-@limiter.limit("20/minute")
-def get_test(request: Request, category_code: str, db: Session = Depends(get_db)):
+@rate_limit.limit("20/minute")
+async def get_test(request: Request, category_code: str, seed: Optional[int] = Query(None, ge=0, lt=2**32), db: DatabaseRunner = Depends(get_data_runner)):
     try:
         test_configs = CONFIG["test_configs"]
         
@@ -175,50 +432,48 @@ def get_test(request: Request, category_code: str, db: Session = Depends(get_db)
             raise HTTPException(status_code=404, detail="Kategoria nie znaleziona")
         
         config = test_configs[category_code]
-        model = get_model_by_code(config["base"])
+        category = get_category_by_code(config["base"])
         
-        if not model:
+        if not category:
             raise HTTPException(status_code=404, detail="Model nie znaleziony")
         
-        all_questions = db.query(model).all()
+        bank = await db.run(question_bank.get, category)
         
-        if not all_questions:
+        if not bank.records:
             raise HTTPException(status_code=404, detail="Brak pytań dla tej kategorii")
         
         if config["count"] is None:
-            questions = all_questions
-            shuffle_mode = False
-        else:
-            count = min(config["count"], len(all_questions))
-            questions = random.sample(all_questions, count)
-            random.shuffle(questions)
-            shuffle_mode = True
+            body = await run_in_threadpool(
+                prerendered.get,
+                category_code,
+                bank,
+                lambda: build_test_response(config, category, bank, None)
+            )
+            return prerendered_response(request, body, http_cache.headers())
         
-        formatted_questions = [
-            format_question(q, shuffle_mode=shuffle_mode) 
-            for q in questions
-        ]
+        if seed is None:
+            seed = sampler.new_seed()
         
-        return {
-            "name": config["name"],
-            "title": config["title"],
-            "icon": config["icon"],
-            "questions": formatted_questions
-        }
+        weights = None
+        if config.get("mode") == "weak":
+            weights = await db.run(difficulty.get, category, bank)
+        
+        return FastJSONResponse(build_test_response(config, category, bank, seed, weights))
     except HTTPException:
         raise
     except Exception:
+        instrumentation.record_exception(request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.post("/api/tests/submit", response_model=schemas.ResultResponse)
-@limiter.limit("30/minute")
-def submit_test(request: Request, submission: schemas.TestSubmit, db: Session = Depends(get_db)):
+@rate_limit.limit("30/minute")
+async def submit_test(request: Request, submission: schemas.TestSubmit, db: DatabaseRunner = Depends(get_data_runner)):
     try:
         base_cat = submission.category_code.split('-')[0].upper()
-        model = get_model_by_code(base_cat)
+        category = get_category_by_code(base_cat)
         
-        if not model:
+        if not category:
             raise HTTPException(status_code=404, detail="Model nie znaleziony")
         
         question_ids = [int(qid) for qid in submission.answers.keys()]
@@ -226,32 +481,58 @@ def submit_test(request: Request, submission: schemas.TestSubmit, db: Session =
         if len(question_ids) > 100:
             raise HTTPException(status_code=400, detail="Too many questions")
         
-        questions = db.query(model).filter(model.id.in_(question_ids)).all()
+        if submission.token:
+            try:
+                test_key = token_signer.verify(submission.token)
+            except InvalidToken:
+                raise HTTPException(status_code=400, detail="Invalid test token")
+            
+            if test_key.category != category:
+                raise HTTPException(status_code=400, detail="Invalid test token")
+            
+            answer_key = test_key.answer_map()
+        else:
+            by_id = (await db.run(question_bank.get, category)).by_id
+            answer_key = {
+                qid: by_id[qid].correct_answer
+                for qid in question_ids
+                if qid in by_id
+            }
         
+        graded = [qid for qid in question_ids if qid in answer_key]
         correct = sum(
-            1 for q in questions 
-            if submission.answers.get(str(q.id)) == q.correct_answer
+            1 for qid in graded
+            if submission.answers.get(str(qid)) == answer_key[qid]
         )
         
-        total = len(questions)
-        percentage = round((correct / total * 100), 2) if total > 0 else 0
+        total = len(graded)
+        percentage = round((correct / total * 100), 2) if total > 0 else 0.0
         passed = percentage >= 50
         
-        return {
+        attempt_recorder.record(
+            submission.user_id,
+            category,
+            submission.category_code if submission.category_code in CONFIG["test_configs"] else category,
+            {qid: submission.answers.get(str(qid)) for qid in graded},
+            answer_key
+        )
+        
+        return FastJSONResponse({
             "score": correct,
             "total": total,
             "percentage": percentage,
             "passed": passed
-        }
+        })
     except HTTPException:
         raise
     except Exception:
+        instrumentation.record_exception(request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.get("/api/search")
-@limiter.limit("20/minute")
-def search(request: Request, q: str, db: Session = Depends(get_db)):
+@rate_limit.limit("20/minute")
+async def search(request: Request, q: str, db: DatabaseRunner = Depends(get_data_runner)):
     try:
         if not q or len(q.strip()) < 2:
             return {"questions": [], "tests": [], "practices": []}
@@ -260,173 +541,70 @@ def search(request: Request, q: str, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Query too long")
         
         search_query = q.strip()
-        query_text = f"%{search_query}%"
         query_lower = search_query.lower()
         
-        category_map = {
-            "E.12": {"name": "E.12", "icon": "🔌", "key": "e12", "model": models.QuestionE12},
-            "E.13": {"name": "E.13", "icon": "⚡", "key": "e13", "model": models.QuestionE13},
-            "INF.02": {"name": "INF.02 / EE.08", "icon": "🖥️", "key": "inf02", "model": models.QuestionINF02},
-            "INF.03": {"name": "INF.03 / EE.09", "icon": "💾", "key": "inf03", "model": models.QuestionINF03},
-            "INF.04": {"name": "INF.04", "icon": "📱", "key": "inf04", "model": models.QuestionINF04},
-        }
+        totals = await db.run(counts.snapshot)
         
         all_questions = []
-        for cat_code, cat_info in category_map.items():
-            model = cat_info["model"]
+        try:
+            hits = await db.run(find_questions, search_query, catalog.category_order)
             
-            try:
-                questions = db.query(model).filter(
-                    or_(
-                        model.question.ilike(query_text),
-                        model.answer_a.ilike(query_text),
-                        model.answer_b.ilike(query_text),
-                        model.answer_c.ilike(query_text),
-                        model.answer_d.ilike(query_text)
-                    )
-                ).limit(5).all()
-                
-                for question_obj in questions:
-                    question_text = question_obj.question
-                    if len(question_text) > 100:
-                        question_text = question_text[:100] + "..."
-                    
-                    all_questions.append({
-                        "id": question_obj.id,
-                        "question": question_text,
-                        "category": f"{cat_info['key']}-baza",
-                        "categoryName": cat_info["name"],
-                        "icon": cat_info["icon"]
-                    })
-            except Exception:
-                continue
+            for hit in hits:
+                cat_info = catalog.categories.get(hit.category)
+                if cat_info:
+                    all_questions.append(format_search_question(hit.question_id, hit.question, cat_info))
+        except Exception:
+            instrumentation.logger.exception("Question search failed for %r", search_query)
+            all_questions = []
         
         all_questions = all_questions[:10]
         
         tests = []
-        test_keywords = ["test", "pytań", "baza", "losowe"]
-        
-        for cat_code, cat_info in category_map.items():
-            should_include = (
-                query_lower in cat_info["name"].lower() or 
-                query_lower in cat_info["key"].lower() or
-                any(keyword in query_lower for keyword in test_keywords)
-            )
-            
-            if should_include:
-                try:
-                    count = db.query(cat_info["model"]).count()
-                    key = cat_info["key"]
-                    name = cat_info["name"]
-                    icon = cat_info["icon"]
-                    
-                    tests.extend([
-                        {
-                            "id": f"{key}-40",
-                            "title": f"Test 40 pytań {name}",
-                            "category": f"{key}-40",
-                            "categoryName": name,
-                            "type": "test",
-                            "questions": min(40, count),
-                            "icon": icon
-                        },
-                        {
-                            "id": f"{key}-20",
-                            "title": f"Test 20 pytań {name}",
-                            "category": f"{key}-20",
-                            "categoryName": name,
-                            "type": "test",
-                            "questions": min(20, count),
-                            "icon": icon
-                        },
-                        {
-                            "id": f"{key}-1",
-                            "title": f"Losowe pytanie {name}",
-                            "category": f"{key}-1",
-                            "categoryName": name,
-                            "type": "test",
-                            "questions": 1,
-                            "icon": icon
-                        },
-                        {
-                            "id": f"{key}-baza",
-                            "title": f"Baza pytań {name}",
-                            "category": f"{key}-baza",
-                            "categoryName": name,
-                            "type": "database",
-                            "questions": count,
-                            "icon": icon
-                        }
-                    ])
-                except Exception:
-                    continue
+        for cat_code in catalog.match_categories(query_lower):
+            tests.extend(catalog.test_entries(cat_code, totals.get(("questions", cat_code), 0)))
+            if len(tests) >= 8:
+                break
         
         tests = tests[:8]
         
         practices = []
-        practice_keywords = ["praktyka", "arkusz", "egzamin"]
         
-        for profile_id, profile_info in CONFIG["practice_profiles_info"].items():
-            model = PRACTICE_MODELS.get(profile_id)
-            if not model:
-                continue
-            
-            try:
-                archives = db.query(model).filter(
-                    or_(
-                        model.code.ilike(query_text),
-                        model.date.ilike(query_text)
-                    )
-                ).limit(5).all()
-                
-                for archive in archives:
-                    practices.append({
-                        "id": f"{profile_id}-{archive.id}",
-                        "type": "archive",
-                        "profile_id": profile_id,
-                        "archive_id": archive.id,
-                        "title": archive.code,
-                        "subtitle": archive.date,
-                        "category": profile_info['name'],
-                        "icon": profile_info['icon'],
-                        "color": profile_info['color']
-                    })
-            except Exception:
-                continue
+        try:
+            archive_hits = await db.run(find_archives, list(CONFIG["practice_profiles_info"]), search_query)
+        except Exception:
+            instrumentation.logger.exception("Archive search failed for %r", search_query)
+            archive_hits = []
+        
+        for hit in archive_hits:
+            profile_info = CONFIG["practice_profiles_info"][hit.profile_id]
+            practices.append({
+                "id": f"{hit.profile_id}-{hit.archive_id}",
+                "type": "archive",
+                "profile_id": hit.profile_id,
+                "archive_id": hit.archive_id,
+                "title": hit.code,
+                "subtitle": hit.date,
+                "category": profile_info['name'],
+                "icon": profile_info['icon'],
+                "color": profile_info['color']
+            })
         
-        for profile_id, profile_info in CONFIG["practice_profiles_info"].items():
-            should_include = (
-                query_lower in profile_info['name'].lower() or
-                query_lower in profile_info['title'].lower() or
-                query_lower in profile_info['category'].lower() or
-                query_lower in profile_info['description'].lower() or
-                query_lower in profile_id.lower() or
-                any(keyword in query_lower for keyword in practice_keywords)
-            )
-            
-            if should_include:
-                model = PRACTICE_MODELS.get(profile_id)
-                if not model:
-                    continue
-                
-                try:
-                    already_added = any(p.get('profile_id') == profile_id for p in practices)
-                    
-                    if not already_added:
-                        archives_count = db.query(model).count()
-                        practices.append({
-                            "id": profile_id,
-                            "type": "profile",
-                            "profile_id": profile_id,
-                            "title": profile_info['name'],
-                            "subtitle": profile_info['title'],
-                            "category": profile_info['category'],
-                            "icon": profile_info['icon'],
-                            "color": profile_info['color'],
-                            "archives_count": archives_count
-                        })
-                except Exception:
-                    continue
+        added_profiles = {p['profile_id'] for p in practices}
+        for profile_id in catalog.match_profiles(query_lower):
+            if profile_id in added_profiles:
+                continue
+            profile_info = CONFIG["practice_profiles_info"][profile_id]
+            practices.append({
+                "id": profile_id,
+                "type": "profile",
+                "profile_id": profile_id,
+                "title": profile_info['name'],
+                "subtitle": profile_info['title'],
+                "category": profile_info['category'],
+                "icon": profile_info['icon'],
+                "color": profile_info['color'],
+                "archives_count": totals.get(("practice", profile_id), 0)
+            })
         
         practices = practices[:10]
         
@@ -438,137 +616,212 @@ def search(request: Request, q: str, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception:
+        instrumentation.record_exception(request)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.get("/api/progress/{user_id}")
+@rate_limit.limit("30/minute")
+async def get_progress(
+    request: Request,
+    user_id: str = Path(max_length=64, pattern=schemas.USER_ID_PATTERN),
+    db: DatabaseRunner = Depends(get_runner)
+):
+    try:
+        totals = await db.run(attempt_recorder.user_progress, user_id)
+        result = []
+        overall = [0, 0, 0]
+        
+        for cat_info in CONFIG["categories_info"]:
+            attempts, answered, correct = totals.get(cat_info["code"], (0, 0, 0))
+            
+            result.append({
+                "code": cat_info["code"],
+                "name": cat_info["name"],
+                "icon": cat_info["icon"],
+                "attempts": attempts,
+                "answered": answered,
+                "correct": correct,
+                "accuracy": round(correct / answered * 100, 2) if answered > 0 else 0.0
+            })
+            
+            overall = [overall[0] + attempts, overall[1] + answered, overall[2] + correct]
+        
+        return {
+            "user_id": user_id,
+            "categories": result,
+            "attempts": overall[0],
+            "answered": overall[1],
+            "correct": overall[2],
+            "accuracy": round(overall[2] / overall[1] * 100, 2) if overall[1] > 0 else 0.0
+        }
+    except Exception:
+        instrumentation.record_exception(request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
+
 @app.get("/api/practice/profiles")
-@limiter.limit("30/minute")
-def get_practice_profiles(request: Request, db: Session = Depends(get_db)):
+@http_cache(from_body=True)
+@rate_limit.limit("30/minute")
+async def get_practice_profiles(request: Request, db: DatabaseRunner = Depends(get_data_runner)):
     try:
+        totals = await db.run(counts.snapshot)
+        downloads = await db.run(download_counters.profile_totals)
         result = []
         
         for profile_id, profile_info in CONFIG["practice_profiles_info"].items():
-            model = PRACTICE_MODELS.get(profile_id)
-            
-            if model:
-                archives_count = db.query(model).count()
-                total_downloads = archives_count * 100
-                
-                result.append({
-                    **profile_info,
-                    'archives_count': archives_count,
-                    'total_downloads': total_downloads
-                })
+            result.append({
+                **profile_info,
+                'archives_count': totals.get(("practice", profile_id), 0),
+                'total_downloads': downloads.get(profile_id, 0)
+            })
         
         return {"profiles": result}
     except Exception:
+        instrumentation.record_exception(request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.get("/api/practice/profile/{profile_id}")
-@limiter.limit("30/minute")
-def get_practice_profile(request: Request, profile_id: str, db: Session = Depends(get_db)):
+@http_cache(from_body=True)
+@rate_limit.limit("30/minute")
+async def get_practice_profile(
+    request: Request,
+    profile_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: DatabaseRunner = Depends(get_data_runner)
+):
     try:
         if profile_id not in CONFIG["practice_profiles_info"]:
             raise HTTPException(status_code=404, detail="Profil nie znaleziony")
         
         profile_info = CONFIG["practice_profiles_info"][profile_id]
-        model = PRACTICE_MODELS.get(profile_id)
+        selected, kinds = parse_archive_fields(fields)
         
-        if not model:
-            raise HTTPException(status_code=404, detail="Model nie znaleziony")
+        position = None
+        if cursor is not None:
+            try:
+                position = decode_cursor(cursor, (int, str, int))
+            except InvalidCursor:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        # One extra row tells whether another page follows.
+        archives = await db.run(
+            functools.partial(
+                query_archives,
+                columns=[c for c in ("code", "downloaded") if c in selected],
+                kinds=kinds,
+                with_files="files" in selected,
+                after=position,
+                limit=limit + 1 if limit is not None else None
+            ),
+            profile_id
+        )
+        archives_count, total_downloads = await db.run(query_archive_summary, profile_id)
         
-        archives = db.query(model).order_by(
-            model.year.desc(), 
-            model.date.desc()
-        ).all()
+        next_cursor = None
+        if limit is not None and len(archives) > limit:
+            archives = archives[:limit]
+            last = archives[-1]
+            next_cursor = encode_cursor(last['year'], last['date'], last['id'])
         
         formatted_archives = []
         for archive in archives:
-            files = {
-                'arkusz': archive.arkusz_url,
-                'pliki': getattr(archive, 'pliki_url', None),
-            }
-            
-            if profile_id == 'inf04':
-                files.update({
-                    'klucz_odpowiedzi': getattr(archive, 'klucz_odpowiedzi_url', None),
-                    'materialy': getattr(archive, 'materialy_url', None),
-                    'rozwiazanie_cs': getattr(archive, 'rozwiazanie_cs_url', None),
-                    'rozwiazanie_cpp': getattr(archive, 'rozwiazanie_cpp_url', None),
-                    'rozwiazanie_java': getattr(archive, 'rozwiazanie_java_url', None),
-                    'rozwiazanie_python': getattr(archive, 'rozwiazanie_python_url', None),
-                })
-            else:
-                files['rozwiazanie'] = getattr(archive, 'rozwiazanie_url', None)
-            
-            formatted_archives.append({
-                'id': archive.id,
-                'code': archive.code,
-                'date': archive.date,
-                'year': archive.year,
+            formatted = {
+                'id': archive['id'],
+                'code': archive.get('code'),
+                'date': archive['date'],
+                'year': archive['year'],
                 'type': 'Egzamin główny',
-                'downloaded': 1000 + archive.id * 100,
-                'files': files
-            })
+                'downloaded': download_counters.archive_downloads(profile_id, archive['id'], archive.get('downloaded')),
+                'files': archive['files']
+            }
+            formatted_archives.append({k: v for k, v in formatted.items() if k in selected})
         
-        return {
+        result = {
             **profile_info,
             'archives': formatted_archives,
-            'archives_count': len(formatted_archives),
-            'total_downloads': sum(a['downloaded'] for a in formatted_archives)
+            'archives_count': archives_count,
+            'total_downloads': total_downloads
         }
+        if limit is not None:
+            result['next_cursor'] = next_cursor
+        return result
     except HTTPException:
         raise
     except Exception:
+        instrumentation.record_exception(request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.get("/api/practice/archive/{profile_id}/{archive_id}")
-@limiter.limit("30/minute")
-def get_practice_archive(request: Request, profile_id: str, archive_id: int, db: Session = Depends(get_db)):
+@http_cache(from_body=True)
+@rate_limit.limit("30/minute")
+async def get_practice_archive(request: Request, profile_id: str, archive_id: int, db: DatabaseRunner = Depends(get_data_runner)):
     try:
-        if profile_id not in PRACTICE_MODELS:
+        if profile_id not in CONFIG["practice_profiles_info"]:
             raise HTTPException(status_code=404, detail="Profil nie znaleziony")
         
-        model = PRACTICE_MODELS[profile_id]
-        archive = db.query(model).filter(model.id == archive_id).first()
+        archives = await db.run(query_archives, profile_id, archive_id)
         
-        if not archive:
+        if not archives:
             raise HTTPException(status_code=404, detail="Arkusz nie znaleziony")
         
-        files = {
-            'arkusz': archive.arkusz_url,
-            'pliki': archive.pliki_url,
-            'rozwiazanie': archive.rozwiazanie_url,
-        }
-        
-        if profile_id == 'inf04':
-            files.update({
-                'klucz_odpowiedzi': getattr(archive, 'klucz_odpowiedzi_url', None),
-                'materialy': getattr(archive, 'materialy_url', None),
-                'rozwiazanie_cs': getattr(archive, 'rozwiazanie_cs_url', None),
-                'rozwiazanie_cpp': getattr(archive, 'rozwiazanie_cpp_url', None),
-                'rozwiazanie_java': getattr(archive, 'rozwiazanie_java_url', None),
-                'rozwiazanie_python': getattr(archive, 'rozwiazanie_python_url', None),
-            })
+        archive = archives[0]
         
         return {
-            'id': archive.id,
-            'code': archive.code,
-            'date': archive.date,
-            'year': archive.year,
-            'type': archive.type,
+            'id': archive['id'],
+            'code': archive['code'],
+            'date': archive['date'],
+            'year': archive['year'],
+            'type': archive['type'],
             'profile': profile_id,
             'profile_info': CONFIG["practice_profiles_info"][profile_id],
-            'files': files,
-            'downloaded': 1000 + archive.id * 100
+            'files': archive['files'],
+            'downloaded': download_counters.archive_downloads(profile_id, archive['id'], archive['downloaded'])
         }
     except HTTPException:
         raise
     except Exception:
+        instrumentation.record_exception(request)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@app.get("/api/practice/download/{profile_id}/{archive_id}/{kind}")
+@rate_limit.limit("60/minute")
+async def download_practice_file(request: Request, profile_id: str, archive_id: int, kind: str, db: DatabaseRunner = Depends(get_data_runner)):
+    try:
+        if profile_id not in CONFIG["practice_profiles_info"]:
+            raise HTTPException(status_code=404, detail="Profil nie znaleziony")
+        
+        archives = await db.run(
+            functools.partial(query_archives, columns=(), kinds=[kind]),
+            profile_id,
+            archive_id
+        )
+        
+        if not archives:
+            raise HTTPException(status_code=404, detail="Arkusz nie znaleziony")
+        
+        url = archives[0]['files'].get(kind)
+        
+        if not url:
+            raise HTTPException(status_code=404, detail="Plik nie znaleziony")
+        
+        download_counters.record(profile_id, archive_id)
+        
+        return RedirectResponse(url, status_code=302)
+    except HTTPException:
+        raise
+    except Exception:
+        instrumentation.record_exception(request)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+STARTUP_TIMINGS["import_ms"] = round((time.perf_counter() - STARTED_AT) * 1000, 1)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,190 @@
+import argparse
+
+from sqlalchemy import create_engine, insert, inspect, select, text
+
+from database import Base, engine
+from search_index import SearchIndex
+import data_digest, models
+
+LEGACY_QUESTION_TABLES = {
+    "E.12": "questions_e12",
+    "E.13": "questions_e13",
+    "INF.02": "questions_inf02",
+    "INF.03": "questions_inf03",
+    "INF.04": "questions_inf04",
+}
+
+LEGACY_PRACTICE_TABLES = {
+    "inf02": "practice_inf02",
+    "ee08": "practice_ee08",
+    "e12": "practice_e12",
+    "e13": "practice_e13",
+    "inf03": "practice_inf03",
+    "ee09": "practice_ee09",
+    "e14": "practice_e14",
+    "inf04": "practice_inf04",
+}
+
+ARCHIVE_COLUMNS = ["id", "code", "date", "year", "type", "downloaded"]
+
+QUESTION_COLUMNS = [
+    "id", "question", "image_url",
+    "answer_a", "answer_b", "answer_c", "answer_d",
+    "correct_answer", "explanation",
+]
+
+
+def read_legacy_rows(source_engine, tables: dict, columns: list = None):
+    available = set(inspect(source_engine).get_table_names())
+    rows = {}
+
+    with source_engine.connect() as source:
+        for key, table in tables.items():
+            if table not in available:
+                continue
+            selected = ", ".join(columns) if columns else "*"
+            result = source.execute(text(f"SELECT {selected} FROM {table} ORDER BY id"))
+            rows[key] = [dict(row._mapping) for row in result]
+
+    return rows
+
+
+def drop_legacy_tables(source_engine, tables):
+    available = set(inspect(source_engine).get_table_names())
+    with source_engine.begin() as conn:
+        for table in tables:
+            if table in available:
+                conn.execute(text(f"DROP TABLE {table}"))
+
+
+def migrate_questions(source_engine, target_engine, drop_legacy: bool = False):
+    Base.metadata.create_all(bind=target_engine, tables=data_digest.TABLES)
+    legacy = read_legacy_rows(source_engine, LEGACY_QUESTION_TABLES, QUESTION_COLUMNS)
+    copied = {}
+
+    with target_engine.begin() as target:
+        for category, rows in legacy.items():
+            existing = set(target.execute(
+                select(models.Question.id).where(models.Question.category == category)
+            ).scalars())
+            missing = [
+                {**row, "category": category}
+                for row in rows
+                if row["id"] not in existing
+            ]
+            if missing:
+                target.execute(insert(models.Question), missing)
+            copied[category] = len(missing)
+        data_digest.stamp(target)
+
+    if drop_legacy:
+        drop_legacy_tables(source_engine, LEGACY_QUESTION_TABLES.values())
+
+    return copied
+
+
+def migrate_practice(source_engine, target_engine, drop_legacy: bool = False):
+    Base.metadata.create_all(bind=target_engine, tables=data_digest.TABLES)
+    legacy = read_legacy_rows(source_engine, LEGACY_PRACTICE_TABLES)
+    copied = {}
+
+    with target_engine.begin() as target:
+        for profile, rows in legacy.items():
+            existing = set(target.execute(
+                select(models.PracticeArchive.id).where(models.PracticeArchive.profile == profile)
+            ).scalars())
+            archives = []
+            files = []
+
+            for row in rows:
+                if row["id"] in existing:
+                    continue
+                archives.append({
+                    **{column: row.get(column) for column in ARCHIVE_COLUMNS},
+                    "profile": profile,
+                })
+                # Every legacy *_url column becomes a typed file row; empty
+                # slots are kept so the file map keeps its per-profile shape.
+                files.extend(
+                    {
+                        "profile": profile,
+                        "archive_id": row["id"],
+                        "kind": column[:-len("_url")],
+                        "url": value,
+                    }
+                    for column, value in row.items()
+                    if column.endswith("_url")
+                )
+
+            if archives:
+                target.execute(insert(models.PracticeArchive), archives)
+            if files:
+                target.execute(insert(models.PracticeFile), files)
+            copied[profile] = len(archives)
+        data_digest.stamp(target)
+
+    if drop_legacy:
+        drop_legacy_tables(source_engine, LEGACY_PRACTICE_TABLES.values())
+
+    return copied
+
+
+def scope_archive_codes(target_engine) -> bool:
+    # Databases created before codes were scoped to their profile carry a
+    # unique index on code alone; create_all leaves existing tables as they are.
+    indexes = {index["name"]: index for index in inspect(target_engine).get_indexes("practice_archives")}
+    legacy = indexes.get("ix_practice_archives_code")
+    if legacy is None or not legacy["unique"]:
+        return False
+    with target_engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_practice_archives_code"))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX uq_practice_archives_profile_code ON practice_archives (profile, code)"
+        ))
+    return True
+
+
+def create_schema(target_engine):
+    Base.metadata.create_all(bind=target_engine)
+    scope_archive_codes(target_engine)
+    SearchIndex().create(target_engine)
+    # Also picks up rows edited outside migrate.py and ingest.py.
+    with target_engine.begin() as conn:
+        data_digest.stamp(conn)
+
+
+def vacuum(target_engine):
+    if target_engine.dialect.name == "sqlite":
+        with target_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WEB3Informatyk database migrations")
+    parser.add_argument("migration", choices=["schema", "questions", "practice", "all"])
+    parser.add_argument("--source", help="database URL holding the legacy tables (defaults to DATABASE_URL)")
+    parser.add_argument("--drop-legacy", action="store_true", help="drop the legacy tables after copying")
+    args = parser.parse_args()
+
+    source_engine = create_engine(args.source) if args.source else engine
+
+    if args.migration in ("questions", "all"):
+        copied = migrate_questions(source_engine, engine, drop_legacy=args.drop_legacy)
+        for category, total in copied.items():
+            print(f"{category}: copied {total} questions")
+
+    if args.migration in ("practice", "all"):
+        copied = migrate_practice(source_engine, engine, drop_legacy=args.drop_legacy)
+        for profile, total in copied.items():
+            print(f"{profile}: copied {total} archives")
+
+    if args.migration in ("schema", "all"):
+        create_schema(engine)
+        print("schema, search index and data digest are up to date")
+
+    if args.drop_legacy:
+        vacuum(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Float, ForeignKeyConstraint, Index, Integer, String, Text, UniqueConstraint
 from database import Base
 
-class QuestionE12(Base):
-    __tablename__ = "questions_e12"
+class Question(Base):
+    __tablename__ = "questions"
     
-    id = Column(Integer, primary_key=True, index=True)
+    category = Column(String(16), primary_key=True)
+    id = Column(Integer, primary_key=True)
     question = Column(Text, nullable=False)
     image_url = Column(Text, nullable=True)
     answer_a = Column(Text, nullable=False)
@@ -14,164 +15,96 @@ class QuestionE12(Base):
     correct_answer = Column(String(1), nullable=False)
     explanation = Column(Text, nullable=True)
 
-class QuestionE13(Base):
-    __tablename__ = "questions_e13"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    question = Column(Text, nullable=False)
-    image_url = Column(Text, nullable=True)
-    answer_a = Column(Text, nullable=False)
-    answer_b = Column(Text, nullable=False)
-    answer_c = Column(Text, nullable=False)
-    answer_d = Column(Text, nullable=False)
-    correct_answer = Column(String(1), nullable=False)
-    explanation = Column(Text, nullable=True)
 
-class QuestionINF02(Base):
-    __tablename__ = "questions_inf02"
+class PracticeArchive(Base):
+    __tablename__ = "practice_archives"
     
-    id = Column(Integer, primary_key=True, index=True)
-    question = Column(Text, nullable=False)
-    image_url = Column(Text, nullable=True)
-    answer_a = Column(Text, nullable=False)
-    answer_b = Column(Text, nullable=False)
-    answer_c = Column(Text, nullable=False)
-    answer_d = Column(Text, nullable=False)
-    correct_answer = Column(String(1), nullable=False)
-    explanation = Column(Text, nullable=True)
-
-class QuestionINF03(Base):
-    __tablename__ = "questions_inf03"
+    profile = Column(String(16), primary_key=True)
+    id = Column(Integer, primary_key=True)
+    code = Column(String(50), nullable=False)
+    date = Column(String(50), nullable=False)
+    year = Column(Integer, nullable=False)
+    type = Column(String(100), nullable=True)
+    downloaded = Column(Integer, default=0)
     
-    id = Column(Integer, primary_key=True, index=True)
-    question = Column(Text, nullable=False)
-    image_url = Column(Text, nullable=True)
-    answer_a = Column(Text, nullable=False)
-    answer_b = Column(Text, nullable=False)
-    answer_c = Column(Text, nullable=False)
-    answer_d = Column(Text, nullable=False)
-    correct_answer = Column(String(1), nullable=False)
-    explanation = Column(Text, nullable=True)
+    __table_args__ = (
+        # Codes are unique within a profile, as in the legacy per-profile tables.
+        UniqueConstraint("profile", "code", name="uq_practice_archives_profile_code"),
+        Index("ix_practice_archives_profile_year_date", "profile", "year", "date"),
+    )
+
 
-class QuestionINF04(Base):
-    __tablename__ = "questions_inf04"
+class PracticeFile(Base):
+    __tablename__ = "practice_files"
     
-    id = Column(Integer, primary_key=True, index=True)
-    question = Column(Text, nullable=False)
-    image_url = Column(Text, nullable=True)
-    answer_a = Column(Text, nullable=False)
-    answer_b = Column(Text, nullable=False)
-    answer_c = Column(Text, nullable=False)
-    answer_d = Column(Text, nullable=False)
-    correct_answer = Column(String(1), nullable=False)
-    explanation = Column(Text, nullable=True)
+    profile = Column(String(16), primary_key=True)
+    archive_id = Column(Integer, primary_key=True)
+    kind = Column(String(32), primary_key=True)
+    url = Column(Text, nullable=True)
+    
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["profile", "archive_id"],
+            ["practice_archives.profile", "practice_archives.id"],
+            ondelete="CASCADE",
+        ),
+    )
 
 
-class PracticeINF02(Base):
-    __tablename__ = "practice_inf02"
+class Attempt(Base):
+    __tablename__ = "attempts"
     
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    rozwiazanie_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
-
-class PracticeEE08(Base):
-    __tablename__ = "practice_ee08"
+    # Generated by the API so answers can be queued before the attempt row
+    # is written.
+    id = Column(String(32), primary_key=True)
+    user_id = Column(String(64), nullable=True)
+    category = Column(String(16), nullable=False)
+    test_key = Column(String(32), nullable=False)
+    score = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    created_at = Column(Float, nullable=False)
     
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    rozwiazanie_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
+    __table_args__ = (
+        Index("ix_attempts_user_created", "user_id", "created_at"),
+    )
 
-class PracticeE13(Base):
-    __tablename__ = "practice_e13"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    rozwiazanie_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
 
-class PracticeE12(Base):
-    __tablename__ = "practice_e12"
+class AttemptAnswer(Base):
+    __tablename__ = "attempt_answers"
     
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    rozwiazanie_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
-
-class PracticeINF03(Base):
-    __tablename__ = "practice_inf03"
+    attempt_id = Column(String(32), primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    answer = Column(String(1), nullable=True)
+    correct = Column(Integer, nullable=False)
     
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    rozwiazanie_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
+    __table_args__ = (
+        ForeignKeyConstraint(["attempt_id"], ["attempts.id"], ondelete="CASCADE"),
+    )
+
 
-class PracticeEE09(Base):
-    __tablename__ = "practice_ee09"
+class QuestionStat(Base):
+    __tablename__ = "question_stats"
     
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    rozwiazanie_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
+    category = Column(String(16), primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    answered = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+
 
-class PracticeE14(Base):
-    __tablename__ = "practice_e14"
+class UserCategoryStat(Base):
+    __tablename__ = "user_category_stats"
     
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    rozwiazanie_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
+    user_id = Column(String(64), primary_key=True)
+    category = Column(String(16), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    answered = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+
 
-class PracticeINF04(Base):
-    __tablename__ = "practice_inf04"
+class DataDigest(Base):
+    __tablename__ = "data_digest"
     
-    id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(50), unique=True, nullable=False, index=True)
-    date = Column(String(50), nullable=False)
-    year = Column(Integer, nullable=False, index=True)
-    type = Column(String(100), nullable=True)
-    arkusz_url = Column(Text, nullable=True)
-    pliki_url = Column(Text, nullable=True)
-    klucz_odpowiedzi_url = Column(Text, nullable=True)
-    materialy_url = Column(Text, nullable=True)
-    rozwiazanie_cs_url = Column(Text, nullable=True)
-    rozwiazanie_cpp_url = Column(Text, nullable=True)
-    rozwiazanie_java_url = Column(Text, nullable=True)
-    rozwiazanie_python_url = Column(Text, nullable=True)
-    downloaded = Column(Integer, default=0)
\ No newline at end of file
+    # A single row (id 1) written by migrate.py and ingest.py.
+    id = Column(Integer, primary_key=True)
+    digest = Column(String(64), nullable=False)
+    updated_at = Column(Float, nullable=False)
@@ -0,0 +1,37 @@
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, types: tuple) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise InvalidCursor("malformed cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursor("malformed cursor")
+    if not all(isinstance(value, kind) for value, kind in zip(values, types)):
+        raise InvalidCursor("malformed cursor")
+    return tuple(values)
+
+
+def after_cursor(keys, values) -> object:
+    # Keyset condition for "rows after this one" under a mixed-direction
+    # ORDER BY; keys are (column, descending) pairs in sort order, e.g.
+    # ((year, True), (date, True), (id, False)).
+    clauses = []
+    for i, ((column, descending), value) in enumerate(zip(keys, values)):
+        equal = [prev_column == prev_value for (prev_column, _), prev_value in zip(keys[:i], values[:i])]
+        clauses.append(and_(*equal, column < value if descending else column > value))
+    return or_(*clauses)
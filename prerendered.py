@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from fastapi import Request, Response
+
+from instrumentation import timed_serialization
+from serialization import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class PrerenderedBody:
+    __slots__ = ("source", "identity", "gzip", "br", "etag", "created_at")
+
+    def __init__(self, source, content: dict):
+        self.source = source
+        self.identity = dumps(content)
+        self.gzip = gzip.compress(self.identity, compresslevel=9, mtime=0)
+        self.br = brotli.compress(self.identity, quality=11) if brotli else None
+        self.etag = '"{}"'.format(hashlib.sha256(self.identity).hexdigest()[:32])
+        self.created_at = time.monotonic()
+
+
+class PrerenderedCache:
+    def __init__(self, max_age: Optional[float] = None):
+        self.max_age = max_age
+        self._bodies: Dict[str, PrerenderedBody] = {}
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, body: Optional[PrerenderedBody], source) -> bool:
+        if body is None or body.source is not source:
+            return False
+        if self.max_age and time.monotonic() - body.created_at > self.max_age:
+            return False
+        return True
+
+    def get(self, key: str, source, build: Callable[[], dict]) -> PrerenderedBody:
+        body = self._bodies.get(key)
+        if self._is_fresh(body, source):
+            return body
+
+        with self._lock:
+            body = self._bodies.get(key)
+            if not self._is_fresh(body, source):
+                content = build()
+                with timed_serialization():
+                    body = PrerenderedBody(source, content)
+                self._bodies[key] = body
+        return body
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def accepted_encodings(request: Request) -> set:
+    encodings = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def prerendered_response(request: Request, body: PrerenderedBody, headers: Optional[dict] = None) -> Response:
+    response_headers = {"ETag": body.etag, "Vary": "Accept-Encoding", **(headers or {})}
+
+    if etag_matches(request, body.etag):
+        return Response(status_code=304, headers=response_headers)
+
+    encodings = accepted_encodings(request)
+    if body.br is not None and "br" in encodings:
+        content = body.br
+        response_headers["Content-Encoding"] = "br"
+    elif "gzip" in encodings:
+        content = body.gzip
+        response_headers["Content-Encoding"] = "gzip"
+    else:
+        content = body.identity
+
+    return Response(content=content, media_type="application/json", headers=response_headers)
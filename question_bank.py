@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Question
+from sampler import build_fragment
+
+
+class QuestionRecord(NamedTuple):
+    id: int
+    question: str
+    image_url: Optional[str]
+    answer_a: str
+    answer_b: str
+    answer_c: str
+    answer_d: str
+    correct_answer: str
+    explanation: Optional[str]
+
+
+class CategoryBank:
+    __slots__ = ("records", "fragments", "by_id", "version", "loaded_at")
+
+    def __init__(self, records: Tuple[QuestionRecord, ...], version: int):
+        self.records = records
+        self.fragments = tuple(build_fragment(record) for record in records)
+        self.by_id = {record.id: record for record in records}
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.records)
+
+
+class QuestionBank:
+    def __init__(self, ttl: Optional[float] = None, loader: Optional[Callable[[str], Tuple[QuestionRecord, ...]]] = None):
+        self.ttl = ttl
+        self.loader = loader
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._banks: Dict[str, CategoryBank] = {}
+        self._lock = threading.Lock()
+
+    def bump_version(self):
+        with self._lock:
+            self.version += 1
+            self._banks.clear()
+
+    def _is_fresh(self, bank: Optional[CategoryBank]) -> bool:
+        if bank is None or bank.version != self.version:
+            return False
+        if self.ttl and time.monotonic() - bank.loaded_at > self.ttl:
+            return False
+        return True
+
+    def get(self, db: Session, category: str) -> CategoryBank:
+        bank = self._banks.get(category)
+        if self._is_fresh(bank):
+            self.hits += 1
+            return bank
+
+        # Loaded outside the lock: under AsyncSession.run_sync the query
+        # yields to the event loop, and a second request waiting on a
+        # threading.Lock would block the loop thread the first one needs.
+        # Concurrent misses may load the same category twice; the first one kept wins.
+        self.misses += 1
+        loaded = self._load(db, category)
+        with self._lock:
+            bank = self._banks.get(category)
+            if self._is_fresh(bank):
+                return bank
+            if loaded.version == self.version:
+                self._banks[category] = loaded
+        return loaded
+
+    def _load(self, db: Session, category: str) -> CategoryBank:
+        if self.loader is not None:
+            return CategoryBank(self.loader(category), self.version)
+
+        columns = [getattr(Question, field) for field in QuestionRecord._fields]
+        rows = db.execute(
+            select(*columns)
+            .where(Question.category == category)
+            .order_by(Question.id)
+        ).all()
+        records = tuple(QuestionRecord(*row) for row in rows)
+        return CategoryBank(records, self.version)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        now = time.monotonic()
+        return {
+            "version": self.version,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "categories": {
+                category: {
+                    "questions": len(bank),
+                    "age_seconds": round(now - bank.loaded_at, 3),
+                }
+                for category, bank in self._banks.items()
+            },
+        }
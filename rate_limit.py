@@ -0,0 +1,318 @@
+import asyncio
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Keys per "IN (...)" when reloading shared counts, below SQLite's
+# default host parameter limit.
+RELOAD_CHUNK = 500
+
+# The app runs behind exactly one proxy (Vercel, which overwrites
+# X-Forwarded-For with the real client address, or a local reverse proxy),
+# whose address is the socket peer of every client. Set it to 0 only where
+# clients connect directly, since the header is then theirs to forge.
+PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1"))
+
+
+class RateLimit:
+    __slots__ = ("amount", "unit", "period")
+
+    def __init__(self, spec: str):
+        amount, _, unit = spec.partition("/")
+        unit = unit.strip().rstrip("s")
+        if unit not in PERIODS:
+            raise ValueError(f"Unsupported rate limit: {spec}")
+        self.amount = int(amount)
+        self.unit = unit
+        self.period = PERIODS[unit]
+
+    def __str__(self):
+        return f"{self.amount} per 1 {self.unit}"
+
+
+def sliding_count(previous: int, current: int, elapsed: float) -> float:
+    # Sliding window approximation: the previous fixed window still counts
+    # for the part of it that overlaps the last `period` seconds.
+    return previous * (1 - elapsed) + current
+
+
+def client_address(request: Request) -> str:
+    if PROXY_HOPS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+            if addresses:
+                return addresses[-min(PROXY_HOPS, len(addresses))]
+    return request.client.host if request.client else "127.0.0.1"
+
+
+class MemoryStorage:
+    name = "memory"
+
+    def __init__(self, prune_every: int = 10000):
+        # key -> [window, current hits, previous hits, period]
+        self._windows: Dict[str, list] = {}
+        self.prune_every = prune_every
+        self._hits = 0
+
+    def hit(self, key: str, limit: RateLimit, now: float) -> bool:
+        # Checks run on the event loop thread, so the counters are updated
+        # without taking a lock.
+        window = int(now // limit.period)
+        entry = self._windows.get(key)
+        if entry is None or entry[0] < window - 1:
+            entry = [window, 0, 0, limit.period]
+            self._windows[key] = entry
+        elif entry[0] == window - 1:
+            entry[0], entry[1], entry[2] = window, 0, entry[1]
+
+        if sliding_count(entry[2], entry[1], now / limit.period - window) >= limit.amount:
+            return False
+
+        entry[1] += 1
+        self._hits += 1
+        if self._hits % self.prune_every == 0:
+            self.prune(now)
+        return True
+
+    def prune(self, now: float):
+        expired = [
+            key for key, (window, _, _, period) in list(self._windows.items())
+            if now // period - window > 1
+        ]
+        for key in expired:
+            self._windows.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"storage": self.name, "keys": len(self._windows)}
+
+
+class SQLiteStorage:
+    name = "sqlite"
+
+    def __init__(self, path: str, flush_interval: float = 1.0, flush_size: int = 100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.flushes = 0
+        # (key, window) -> [hits, expires_at] not yet written to the file
+        self._pending: Dict[Tuple[str, int], list] = {}
+        self._pending_hits = 0
+        # The pending hits a flush is writing, counted until _shared has them
+        self._flushing: Dict[Tuple[str, int], list] = {}
+        # (key, window) -> hits from every worker as of the last flush
+        self._shared: Dict[Tuple[str, int], int] = {}
+        self._flushed_at = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._conn = None
+        # Guards _pending, _flushing and _shared, which the event loop reads
+        # and fills while a flush thread takes them over.
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT NOT NULL, window INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, hits INTEGER NOT NULL, "
+                "PRIMARY KEY (key, window)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limits_expires_at ON rate_limits (expires_at)")
+            self._conn = conn
+        return self._conn
+
+    def _count(self, key: str, window: int) -> int:
+        pending = self._pending.get((key, window))
+        flushing = self._flushing.get((key, window))
+        return (
+            self._shared.get((key, window), 0) + (pending[0] if pending else 0) + (flushing[0] if flushing else 0)
+        )
+
+    def hit(self, key: str, limit: RateLimit, now: float) -> bool:
+        window = int(now // limit.period)
+        elapsed = now / limit.period - window
+        with self._lock:
+            if sliding_count(self._count(key, window - 1), self._count(key, window), elapsed) >= limit.amount:
+                allowed = False
+            else:
+                allowed = True
+                pending = self._pending.get((key, window))
+                if pending is None:
+                    self._pending[(key, window)] = [1, (window + 2) * limit.period]
+                else:
+                    pending[0] += 1
+                self._pending_hits += 1
+
+        if self._pending_hits >= self.flush_size or now - self._flushed_at >= self.flush_interval:
+            self._schedule_flush(now)
+        return allowed
+
+    def _schedule_flush(self, now: float):
+        # Checks run on the event loop, so the file I/O (a write lock with a
+        # busy timeout) goes to the threadpool instead of blocking it.
+        if self._flush_task is not None:
+            return
+        self._flushed_at = now
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # A sync handler's check already runs in a worker thread.
+            self.flush(now)
+            return
+        self._flush_task = loop.create_task(self._flush_in_background(now))
+
+    async def _flush_in_background(self, now: float):
+        try:
+            await run_in_threadpool(self.flush, now)
+        finally:
+            self._flush_task = None
+
+    def _reload(self, conn: sqlite3.Connection, keys: list) -> Dict[Tuple[str, int], int]:
+        # Only the keys this worker has seen: the table holds every client
+        # of every worker, and reading all of it each flush grows with them.
+        shared = {}
+        for start in range(0, len(keys), RELOAD_CHUNK):
+            chunk = keys[start:start + RELOAD_CHUNK]
+            rows = conn.execute(
+                f"SELECT key, window, hits FROM rate_limits WHERE key IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            shared.update(((key, window), hits) for key, window, hits in rows)
+        return shared
+
+    def flush(self, now: float):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+                self._pending_hits = 0
+            self._flushed_at = now
+            keys = sorted({key for key, _ in pending} | {key for key, _ in self._shared})
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "INSERT INTO rate_limits (key, window, expires_at, hits) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (key, window) DO UPDATE SET hits = hits + excluded.hits",
+                        [(key, window, expires_at, hits) for (key, window), (hits, expires_at) in pending.items()]
+                    )
+                    conn.execute("DELETE FROM rate_limits WHERE expires_at < ?", (now,))
+                    shared = self._reload(conn, keys)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            except Exception as e:
+                # Fail open: keep the hits for the next flush instead of
+                # turning a busy counter file into failed requests.
+                print(f"⚠️ Warning: rate limit flush failed: {e}")
+                with self._lock:
+                    self._flushing = {}
+                    for slot, (hits, expires_at) in pending.items():
+                        current = self._pending.setdefault(slot, [0, expires_at])
+                        current[0] += hits
+                        self._pending_hits += hits
+                return
+
+            # Swapped together with the pending hits it now includes, so a
+            # check never counts them twice or not at all.
+            with self._lock:
+                self._shared = shared
+                self._flushing = {}
+            self.flushes += 1
+
+    def stats(self) -> dict:
+        return {
+            "storage": self.name,
+            "keys": len(self._shared),
+            "pending_hits": self._pending_hits,
+            "flushes": self.flushes,
+        }
+
+
+def create_storage(uri: str):
+    if uri.startswith("memory://"):
+        return MemoryStorage()
+    if uri.startswith("sqlite:///"):
+        return SQLiteStorage(
+            uri[len("sqlite:///"):],
+            flush_interval=float(os.getenv("RATE_LIMIT_FLUSH_INTERVAL", "1.0")),
+            flush_size=int(os.getenv("RATE_LIMIT_FLUSH_SIZE", "100"))
+        )
+    raise ValueError(f"Unsupported RATE_LIMIT_STORAGE: {uri}")
+
+
+class Limiter:
+    def __init__(self, storage, key_func=client_address):
+        self.storage = storage
+        self.key_func = key_func
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, request: Request, scope: str, limit: RateLimit) -> Optional[Response]:
+        now = time.time()
+        if self.storage.hit(f"{scope}:{self.key_func(request)}", limit, now):
+            self.allowed += 1
+            return None
+
+        self.rejected += 1
+        retry_after = math.ceil(limit.period - now % limit.period)
+        return JSONResponse(
+            {"error": f"Rate limit exceeded: {limit}"},
+            status_code=429,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def limit(self, limit_value: str):
+        limit = RateLimit(limit_value)
+
+        def decorator(func):
+            scope = f"{func.__module__}.{func.__name__}"
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, request: Request, **kwargs):
+                    rejected = self.check(request, scope, limit)
+                    if rejected is not None:
+                        return rejected
+                    return await func(*args, request=request, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, request: Request, **kwargs):
+                rejected = self.check(request, scope, limit)
+                if rejected is not None:
+                    return rejected
+                return func(*args, request=request, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> dict:
+        return {
+            **self.storage.stats(),
+            "proxy_hops": PROXY_HOPS,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+limiter = Limiter(create_storage(os.getenv("RATE_LIMIT_STORAGE", "memory://")))
+limit = limiter.limit
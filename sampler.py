@@ -0,0 +1,132 @@
+import itertools
+import random
+import secrets
+from typing import List, NamedTuple, Optional, Tuple
+
+LETTERS = ("a", "b", "c", "d")
+
+# All 24 orders of the four answers. Index 0 is the identity order used by
+# the unshuffled "baza" tests.
+PERMUTATIONS = tuple(itertools.permutations(range(4)))
+
+# CORRECT_AFTER[p][i] is the letter the originally i-th answer ends up under
+# after applying permutation p.
+CORRECT_AFTER = tuple(
+    tuple(LETTERS[permutation.index(i)] for i in range(4))
+    for permutation in PERMUTATIONS
+)
+
+
+class QuestionFragment(NamedTuple):
+    id: int
+    question: str
+    image: Optional[str]
+    explanation: str
+    texts: Tuple[str, str, str, str]
+    correct_index: int
+
+
+def build_fragment(record) -> QuestionFragment:
+    return QuestionFragment(
+        id=record.id,
+        question=record.question,
+        image=record.image_url,
+        explanation=record.explanation or "",
+        texts=(record.answer_a, record.answer_b, record.answer_c, record.answer_d),
+        correct_index=LETTERS.index(record.correct_answer),
+    )
+
+
+def render(fragment: QuestionFragment, permutation_index: int = 0) -> dict:
+    order = PERMUTATIONS[permutation_index]
+    texts = fragment.texts
+    return {
+        "id": fragment.id,
+        "question": fragment.question,
+        "image": fragment.image,
+        "answers": [
+            {"id": "a", "text": texts[order[0]]},
+            {"id": "b", "text": texts[order[1]]},
+            {"id": "c", "text": texts[order[2]]},
+            {"id": "d", "text": texts[order[3]]},
+        ],
+        "correctAnswer": CORRECT_AFTER[permutation_index][fragment.correct_index],
+        "explanation": fragment.explanation,
+    }
+
+
+def new_seed() -> int:
+    return secrets.randbits(32)
+
+
+def draw(fragments, count: int, seed: int) -> List[Tuple[QuestionFragment, int]]:
+    rng = random.Random(seed)
+    count = min(count, len(fragments))
+    indices = rng.sample(range(len(fragments)), count)
+    orders = rng.choices(range(len(PERMUTATIONS)), k=count)
+    return [(fragments[i], order) for i, order in zip(indices, orders)]
+
+
+def render_test(fragments, count: Optional[int], seed: int) -> List[dict]:
+    if count is None:
+        return [render(fragment) for fragment in fragments]
+    return [render(fragment, order) for fragment, order in draw(fragments, count, seed)]
+
+
+class FenwickTree:
+    # Prefix sums over integer weights, so a weighted pick and a weight
+    # update are both O(log n). Integers keep remove/restore exact.
+    __slots__ = ("size", "weights", "total", "_tree")
+
+    def __init__(self, weights: List[int]):
+        self.size = len(weights)
+        self.weights = list(weights)
+        self.total = sum(self.weights)
+        tree = [0, *self.weights]
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def add(self, index: int, delta: int):
+        self.weights[index] += delta
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def set(self, index: int, weight: int):
+        self.add(index, weight - self.weights[index])
+
+    def find(self, target: int) -> int:
+        # The index whose cumulative weight range contains target.
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self._tree[candidate] <= target:
+                position = candidate
+                target -= self._tree[candidate]
+            step >>= 1
+        return position
+
+
+def draw_weighted(fragments, tree: FenwickTree, count: int, seed: int) -> List[Tuple[QuestionFragment, int]]:
+    # Sampling without replacement: each drawn question is zeroed for the
+    # rest of the draw and restored afterwards, so the caller must hold the
+    # tree exclusively.
+    rng = random.Random(seed)
+    count = min(count, len(fragments))
+    drawn = []
+    try:
+        while len(drawn) < count and tree.total > 0:
+            index = tree.find(rng.randrange(tree.total))
+            drawn.append((index, tree.weights[index]))
+            tree.add(index, -tree.weights[index])
+    finally:
+        for index, weight in drawn:
+            tree.add(index, weight)
+    orders = rng.choices(range(len(PERMUTATIONS)), k=len(drawn))
+    return [(fragments[index], order) for (index, _), order in zip(drawn, orders)]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, Optional, List
 
 class Answer(BaseModel):
     id: str
@@ -18,13 +18,50 @@ class TestResponse(BaseModel):
     title: str
     icon: str
     questions: List[QuestionResponse]
+    seed: Optional[int] = None
+    token: Optional[str] = None
+
+# Anonymous client-generated id (e.g. a UUID kept in localStorage).
+USER_ID_PATTERN = r"^[A-Za-z0-9_-]+$"
 
 class TestSubmit(BaseModel):
     category_code: str
     answers: dict
+    token: Optional[str] = None
+    user_id: Optional[str] = Field(default=None, min_length=1, max_length=64, pattern=USER_ID_PATTERN)
 
 class ResultResponse(BaseModel):
     score: int
     total: int
     percentage: float
-    passed: bool
\ No newline at end of file
+    passed: bool
+
+class QuestionImport(BaseModel):
+    category: Optional[str] = None
+    id: Optional[int] = Field(default=None, ge=1)
+    question: str = Field(min_length=1)
+    image_url: Optional[str] = None
+    answer_a: str
+    answer_b: str
+    answer_c: str
+    answer_d: str
+    correct_answer: str
+    explanation: Optional[str] = None
+
+    @field_validator("correct_answer")
+    @classmethod
+    def check_correct_answer(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in ("a", "b", "c", "d"):
+            raise ValueError("correct_answer must be one of a, b, c, d")
+        return value
+
+class PracticeArchiveImport(BaseModel):
+    profile: Optional[str] = None
+    id: Optional[int] = Field(default=None, ge=1)
+    code: str = Field(min_length=1)
+    date: str
+    year: int
+    type: Optional[str] = None
+    downloaded: int = 0
+    files: Dict[str, Optional[str]] = {}
@@ -0,0 +1,315 @@
+import re
+import threading
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import case, func, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models import PracticeArchive, Question
+
+# unicode61/to_tsvector strip most diacritics on their own, but "ł" has no
+# Unicode decomposition, so it is folded explicitly on both sides.
+POLISH_FOLD = str.maketrans("ąćęłńóśźżĄĆĘŁŃÓŚŹŻ", "acelnoszzACELNOSZZ")
+# Words as unicode61 splits them: letters and digits, with "_" a separator
+# ("PAGE_FAULT" is two tokens), so snapshot token counts match the index.
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def fold_text(value: str) -> str:
+    return value.translate(POLISH_FOLD).lower()
+
+
+def tokenize_query(query: str) -> List[str]:
+    return TOKEN_RE.findall(fold_text(query))
+
+
+class SearchHit(NamedTuple):
+    category: str
+    question_id: int
+    question: str
+    rank: float
+
+
+class ArchiveHit(NamedTuple):
+    profile_id: str
+    archive_id: int
+    code: str
+    date: str
+
+
+def limit_per_group(selectable, group: str, per_group: int, order_by: List[str]):
+    combined = selectable.subquery()
+    position = func.row_number().over(
+        partition_by=combined.c[group],
+        order_by=[combined.c[name] for name in order_by],
+    ).label("position")
+    ranked = select(combined, position).subquery()
+    return (
+        select(*[column for column in ranked.c if column.name != "position"])
+        .where(ranked.c.position <= per_group)
+        .order_by(*[ranked.c[name] for name in order_by])
+    )
+
+
+def search_questions_like(db: Session, categories: List[str], query: str, per_category: int = 5) -> List[SearchHit]:
+    if not categories:
+        return []
+
+    pattern = f"%{query}%"
+    source_order = case(
+        {category: order for order, category in enumerate(categories)},
+        value=Question.category,
+    )
+    matches = select(
+        source_order.label("source_order"),
+        Question.category.label("category"),
+        Question.id.label("question_id"),
+        Question.question.label("question"),
+    ).where(
+        Question.category.in_(categories),
+        or_(
+            Question.question.ilike(pattern),
+            Question.answer_a.ilike(pattern),
+            Question.answer_b.ilike(pattern),
+            Question.answer_c.ilike(pattern),
+            Question.answer_d.ilike(pattern),
+        ),
+    )
+
+    statement = limit_per_group(matches, "category", per_category, ["source_order", "question_id"])
+    return [
+        SearchHit(row.category, row.question_id, row.question, 0.0)
+        for row in db.execute(statement)
+    ]
+
+
+def search_archives(db: Session, profiles: List[str], query: str, per_profile: int = 5) -> List[ArchiveHit]:
+    if not profiles:
+        return []
+
+    pattern = f"%{query}%"
+    source_order = case(
+        {profile: order for order, profile in enumerate(profiles)},
+        value=PracticeArchive.profile,
+    )
+    matches = select(
+        source_order.label("source_order"),
+        PracticeArchive.profile.label("profile_id"),
+        PracticeArchive.id.label("archive_id"),
+        PracticeArchive.code.label("code"),
+        PracticeArchive.date.label("date"),
+    ).where(
+        PracticeArchive.profile.in_(profiles),
+        or_(
+            PracticeArchive.code.ilike(pattern),
+            PracticeArchive.date.ilike(pattern),
+        ),
+    )
+
+    statement = limit_per_group(matches, "profile_id", per_profile, ["source_order", "archive_id"])
+    return [
+        ArchiveHit(row.profile_id, row.archive_id, row.code, row.date)
+        for row in db.execute(statement)
+    ]
+
+
+SQLITE_FOLD = "replace(replace({0}, 'ł', 'l'), 'Ł', 'L')"
+
+SQLITE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    category UNINDEXED,
+    question_id UNINDEXED,
+    display UNINDEXED,
+    question,
+    answers,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POSTGRES_SCHEMA = [
+    """
+    CREATE OR REPLACE FUNCTION pl_fold(value text) RETURNS text AS $$
+        SELECT translate(lower(coalesce(value, '')), 'ąćęłńóśźż', 'acelnoszz')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS questions_search (
+        category varchar(16) NOT NULL,
+        question_id integer NOT NULL,
+        display text NOT NULL,
+        document tsvector NOT NULL,
+        PRIMARY KEY (category, question_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_questions_search_document ON questions_search USING GIN (document)",
+    """
+    CREATE OR REPLACE FUNCTION questions_search_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM questions_search WHERE category = OLD.category AND question_id = OLD.id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO questions_search (category, question_id, display, document)
+            VALUES (
+                NEW.category, NEW.id, NEW.question,
+                setweight(to_tsvector('simple', pl_fold(NEW.question)), 'A') ||
+                setweight(to_tsvector('simple', pl_fold(concat_ws(' ', NEW.answer_a, NEW.answer_b, NEW.answer_c, NEW.answer_d))), 'B')
+            );
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+INDEX_TABLES = {
+    "sqlite": "questions_fts",
+    "postgresql": "questions_search",
+}
+
+
+class SearchIndex:
+    def __init__(self):
+        self.available = False
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def create(self, engine: Engine):
+        with engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                self._create_sqlite(conn)
+            elif conn.dialect.name == "postgresql":
+                self._create_postgres(conn)
+        self._ready = False
+
+    def ensure(self, engine: Engine):
+        # Only probes for the index; creating it is left to "migrate.py schema"
+        # so that cold starts never run DDL.
+        if self._ready:
+            return
+
+        with self._lock:
+            if self._ready:
+                return
+            index_table = INDEX_TABLES.get(engine.dialect.name)
+            try:
+                if index_table:
+                    with engine.connect() as conn:
+                        conn.execute(text(f"SELECT 1 FROM {index_table} LIMIT 1"))
+                self.available = index_table is not None
+            except Exception:
+                self.available = False
+            finally:
+                self._ready = True
+
+    def _sync_index(self, conn, index_table: str):
+        indexed = conn.execute(text(f"SELECT count(*) FROM {index_table}")).scalar()
+        total = conn.execute(text("SELECT count(*) FROM questions")).scalar()
+        if indexed != total:
+            self.rebuild(conn)
+
+    def _create_sqlite(self, conn):
+        conn.execute(text(SQLITE_SCHEMA))
+
+        values = self._sqlite_values("new")
+        statements = [
+            f"""
+            CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN
+                INSERT INTO questions_fts (category, question_id, display, question, answers) VALUES ({values});
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN
+                DELETE FROM questions_fts WHERE category = old.category AND question_id = old.id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE ON questions BEGIN
+                DELETE FROM questions_fts WHERE category = old.category AND question_id = old.id;
+                INSERT INTO questions_fts (category, question_id, display, question, answers) VALUES ({values});
+            END
+            """,
+        ]
+        for statement in statements:
+            conn.execute(text(statement))
+
+        self._sync_index(conn, "questions_fts")
+
+    def _create_postgres(self, conn):
+        for statement in POSTGRES_SCHEMA:
+            conn.execute(text(statement))
+
+        conn.execute(text("DROP TRIGGER IF EXISTS questions_search_sync ON questions"))
+        conn.execute(text(
+            "CREATE TRIGGER questions_search_sync AFTER INSERT OR UPDATE OR DELETE ON questions "
+            "FOR EACH ROW EXECUTE FUNCTION questions_search_sync()"
+        ))
+
+        self._sync_index(conn, "questions_search")
+
+    def _sqlite_values(self, alias: str) -> str:
+        answers = " || ' ' || ".join(f"{alias}.answer_{letter}" for letter in "abcd")
+        return ", ".join([
+            f"{alias}.category",
+            f"{alias}.id",
+            f"{alias}.question",
+            SQLITE_FOLD.format(f"{alias}.question"),
+            SQLITE_FOLD.format(answers),
+        ])
+
+    def rebuild(self, conn):
+        if conn.dialect.name == "sqlite":
+            conn.execute(text("DELETE FROM questions_fts"))
+            conn.execute(text(
+                "INSERT INTO questions_fts (category, question_id, display, question, answers) "
+                f"SELECT {self._sqlite_values('questions')} FROM questions"
+            ))
+        elif conn.dialect.name == "postgresql":
+            conn.execute(text("TRUNCATE questions_search"))
+            conn.execute(text(
+                "INSERT INTO questions_search (category, question_id, display, document) "
+                "SELECT category, id, question, "
+                "setweight(to_tsvector('simple', pl_fold(question)), 'A') || "
+                "setweight(to_tsvector('simple', pl_fold(concat_ws(' ', answer_a, answer_b, answer_c, answer_d))), 'B') "
+                "FROM questions"
+            ))
+
+    def search(self, db: Session, query: str, per_category: int = 5, limit: int = 50) -> Optional[List[SearchHit]]:
+        self.ensure(db.get_bind())
+        if not self.available:
+            return None
+
+        tokens = tokenize_query(query)
+        if not tokens:
+            return []
+
+        if db.get_bind().dialect.name == "sqlite":
+            match = " ".join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+            matches = (
+                "SELECT category, question_id, display, bm25(questions_fts, 0, 0, 0, 10.0, 1.0) AS rank "
+                "FROM questions_fts WHERE questions_fts MATCH :match"
+            )
+            direction = "ASC"
+        else:
+            match = " & ".join(f"{token}:*" for token in tokens)
+            matches = (
+                "SELECT category, question_id, display, ts_rank(document, query) AS rank "
+                "FROM questions_search, to_tsquery('simple', :match) AS query "
+                "WHERE document @@ query"
+            )
+            direction = "DESC"
+
+        # Ties go to (category, question_id), the order a snapshot stores
+        # questions in, so both rank equal scores the same way.
+        statement = text(
+            "SELECT category, question_id, display, rank FROM ("
+            f"SELECT *, ROW_NUMBER() OVER (PARTITION BY category ORDER BY rank {direction}, question_id) AS position "
+            f"FROM ({matches}) AS matches"
+            ") AS ranked "
+            f"WHERE position <= :per_category ORDER BY rank {direction}, category, question_id LIMIT :limit"
+        )
+
+        rows = db.execute(statement, {"match": match, "per_category": per_category, "limit": limit})
+        return [SearchHit(*row) for row in rows]
@@ -0,0 +1,45 @@
+import json
+from typing import Any
+
+from fastapi import Response
+
+from instrumentation import timed_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+if orjson is not None:
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content)
+elif msgspec is not None:
+    _encoder = msgspec.json.Encoder()
+
+    def dumps(content: Any) -> bytes:
+        return _encoder.encode(content)
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    # Handlers that build their payload from trusted rows return this to skip
+    # response_model validation and jsonable_encoder; the route still declares
+    # response_model so the OpenAPI schema is unchanged.
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with timed_serialization():
+            return dumps(content)
@@ -0,0 +1,500 @@
+"""Read-only data snapshot served from a memory-mapped file.
+
+"python snapshot.py build" compiles the questions, practice archives, their
+files and a search index into one file; with DATA_SNAPSHOT set the API
+reads those from it instead of the database. The header carries the same
+data digest the database stores (see data_digest.py), so both modes serve
+the same data under the same cache version.
+
+Limits in snapshot mode:
+
+- Attempts and download counts are still written through the database
+  engine, so DATABASE_URL must point at a writable database unless
+  DATABASE_READONLY turns those writes off.
+- Weak-question tests ignore the answer statistics stored in the database
+  and only weigh batches this process flushed since it started.
+- Download counts start from the values frozen into the snapshot, plus
+  what this process has recorded.
+- The body is hashed once, when it is built; loading only checks the
+  header and the file size. "snapshot.py info --verify" hashes the body.
+"""
+import argparse
+import hashlib
+import math
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from question_bank import QuestionRecord
+from search_index import ArchiveHit, SearchHit, TOKEN_RE, fold_text, tokenize_query
+
+MAGIC = b"W3SN"
+FORMAT_VERSION = 2
+NULL = 0xFFFFFFFF
+
+SECTIONS = ("strings", "categories", "questions", "profiles", "archives", "files", "terms", "postings")
+
+# magic, format version, built_at, indexed tokens, data digest of the
+# database it was built from, sha256 and size of everything after the
+# header, (offset, count) for every section, then the first 16 bytes of a
+# sha256 over all of the above.
+HEADER = struct.Struct("<4sHxxdQ32s32sQ" + "II" * len(SECTIONS) + "16s")
+# code, first question, question count
+CATEGORY = struct.Struct("<IIII")
+# id, question, image_url, answer_a..d, explanation, correct answer,
+# indexed tokens
+QUESTION = struct.Struct("<I" + "II" * 7 + "BxH")
+# profile, first archive, archive count
+PROFILE = struct.Struct("<IIII")
+# id, code, date, year, type, downloaded, first file, file count
+ARCHIVE = struct.Struct("<IIIIIiIIIII")
+# kind, url
+FILE = struct.Struct("<IIII")
+# term, first posting, posting count
+TERM = struct.Struct("<IIII")
+# question index, occurrences in the question, occurrences in the answers
+POSTING = struct.Struct("<IHH")
+
+RECORD_SIZES = {
+    "strings": 1, "categories": CATEGORY.size, "questions": QUESTION.size, "profiles": PROFILE.size,
+    "archives": ARCHIVE.size, "files": FILE.size, "terms": TERM.size, "postings": POSTING.size,
+}
+
+# Same ranking as the FTS5 index: bm25 with the question weighted 10 and the
+# answers 1.
+QUESTION_WEIGHT = 10.0
+ANSWER_WEIGHT = 1.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def header_check(fields) -> bytes:
+    return hashlib.sha256(HEADER.pack(*fields, b"")).digest()[:16]
+
+
+class StringTable:
+    def __init__(self):
+        self.blob = bytearray()
+        self._offsets: Dict[str, int] = {}
+
+    def ref(self, value: Optional[str]) -> Tuple[int, int]:
+        if value is None:
+            return 0, NULL
+        encoded = value.encode("utf-8")
+        # Answers, archive types and file kinds repeat a lot, so identical
+        # strings are stored once.
+        offset = self._offsets.get(value)
+        if offset is None:
+            offset = len(self.blob)
+            self.blob += encoded
+            self._offsets[value] = offset
+        return offset, len(encoded)
+
+
+def build_snapshot(conn, path: Path) -> dict:
+    from sqlalchemy import select
+
+    from data_digest import compute_digest
+    from models import PracticeArchive, PracticeFile, Question
+
+    strings = StringTable()
+    sections = {name: bytearray() for name in SECTIONS if name != "strings"}
+    terms: Dict[str, Dict[int, List[int]]] = {}
+    total_tokens = 0
+
+    question_columns = [getattr(Question, field) for field in QuestionRecord._fields]
+    rows = conn.execute(
+        select(Question.category, *question_columns).order_by(Question.category, Question.id)
+    ).all()
+
+    category_starts: Dict[str, List[int]] = {}
+    for index, row in enumerate(rows):
+        category, record = row[0], QuestionRecord(*row[1:])
+        category_starts.setdefault(category, [index, 0])[1] += 1
+        answers = " ".join((record.answer_a, record.answer_b, record.answer_c, record.answer_d))
+        tokens = 0
+        for column, text in enumerate((record.question, answers)):
+            for term in TOKEN_RE.findall(fold_text(text)):
+                terms.setdefault(term, {}).setdefault(index, [0, 0])[column] += 1
+                tokens += 1
+        total_tokens += tokens
+
+        refs = [
+            strings.ref(getattr(record, field))
+            for field in ("question", "image_url", "answer_a", "answer_b", "answer_c", "answer_d", "explanation")
+        ]
+        sections["questions"] += QUESTION.pack(
+            record.id, *(part for ref in refs for part in ref), ord(record.correct_answer), min(tokens, 0xFFFF)
+        )
+
+    for category, (first, count) in category_starts.items():
+        sections["categories"] += CATEGORY.pack(*strings.ref(category), first, count)
+
+    for term in sorted(terms):
+        postings = terms[term]
+        sections["terms"] += TERM.pack(*strings.ref(term), len(sections["postings"]) // POSTING.size, len(postings))
+        for index in sorted(postings):
+            sections["postings"] += POSTING.pack(index, *(min(count, 0xFFFF) for count in postings[index]))
+
+    archives = conn.execute(
+        select(
+            PracticeArchive.profile, PracticeArchive.id, PracticeArchive.code, PracticeArchive.date,
+            PracticeArchive.year, PracticeArchive.type, PracticeArchive.downloaded
+        ).order_by(PracticeArchive.profile, PracticeArchive.year.desc(), PracticeArchive.date.desc(), PracticeArchive.id)
+    ).all()
+    files: Dict[Tuple[str, int], List[Tuple[str, Optional[str]]]] = {}
+    for row in conn.execute(
+        select(PracticeFile.profile, PracticeFile.archive_id, PracticeFile.kind, PracticeFile.url)
+        .order_by(PracticeFile.profile, PracticeFile.archive_id, PracticeFile.kind)
+    ):
+        files.setdefault((row.profile, row.archive_id), []).append((row.kind, row.url))
+
+    profile_starts: Dict[str, List[int]] = {}
+    file_count = 0
+    for index, row in enumerate(archives):
+        profile_starts.setdefault(row.profile, [index, 0])[1] += 1
+        archive_files = files.get((row.profile, row.id), [])
+        sections["archives"] += ARCHIVE.pack(
+            row.id, *strings.ref(row.code), *strings.ref(row.date), row.year,
+            *strings.ref(row.type), row.downloaded or 0, file_count, len(archive_files)
+        )
+        for kind, url in archive_files:
+            sections["files"] += FILE.pack(*strings.ref(kind), *strings.ref(url))
+        file_count += len(archive_files)
+
+    for profile, (first, count) in profile_starts.items():
+        sections["profiles"] += PROFILE.pack(*strings.ref(profile), first, count)
+
+    sections["strings"] = strings.blob
+
+    body = bytearray()
+    table = []
+    for name in SECTIONS:
+        data, size = sections[name], RECORD_SIZES[name]
+        # Keep every record table 8-byte aligned.
+        body += b"\0" * (-(HEADER.size + len(body)) % 8)
+        table += [HEADER.size + len(body), len(data) // size]
+        body += data
+
+    # The same digest the API reads from the database, so both modes serve
+    # the same data under the same cache version.
+    content_digest = bytes.fromhex(compute_digest(conn))
+    body_digest = hashlib.sha256(body).digest()
+    fields = (MAGIC, FORMAT_VERSION, time.time(), total_tokens, content_digest, body_digest, len(body), *table)
+    header = HEADER.pack(*fields, header_check(fields))
+
+    # The body is checked once here, against what actually reached the
+    # disk; loading only checks the header and the size.
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(header + body)
+    if hashlib.sha256(tmp_path.read_bytes()[HEADER.size:]).digest() != body_digest:
+        tmp_path.unlink()
+        raise SnapshotError(f"{tmp_path}: written body does not match its digest")
+    tmp_path.replace(path)
+
+    return {
+        "questions": len(rows),
+        "categories": len(category_starts),
+        "archives": len(archives),
+        "profiles": len(profile_starts),
+        "terms": len(terms),
+        "bytes": len(header) + len(body),
+    }
+
+
+class Snapshot:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+
+        if len(self._mm) < HEADER.size:
+            raise SnapshotError(f"{self.path}: truncated header")
+        *fields, check = HEADER.unpack_from(self._mm, 0)
+        magic, version, self.built_at, total_tokens, digest, self._body_digest, body_size, *table = fields
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError(f"{self.path}: not a version {FORMAT_VERSION} snapshot")
+        # Hashing the body would read the whole file on every cold start; it
+        # was checked when it was built (see verify() for a full check).
+        if check != header_check(fields):
+            raise SnapshotError(f"{self.path}: corrupt header")
+        if len(self._mm) != HEADER.size + body_size:
+            raise SnapshotError(f"{self.path}: expected {HEADER.size + body_size} bytes, found {len(self._mm)}")
+        self.digest = digest.hex()
+        self._sections = {
+            name: (table[2 * i], table[2 * i + 1])
+            for i, name in enumerate(SECTIONS)
+        }
+        for name, (offset, count) in self._sections.items():
+            if offset + count * RECORD_SIZES[name] > len(self._mm):
+                raise SnapshotError(f"{self.path}: truncated {name} section")
+        self._strings = self._sections["strings"][0]
+        self._term_count = self._sections["terms"][1]
+        self._question_count = self._sections["questions"][1]
+        self._average_tokens = total_tokens / self._question_count if self._question_count else 0.0
+
+        self.categories: Dict[str, Tuple[int, int]] = {}
+        for _, code_offset, code_length, first, count in self._records("categories", CATEGORY):
+            self.categories[self._str(code_offset, code_length)] = (first, count)
+
+        self.profiles: Dict[str, Tuple[int, int]] = {}
+        for _, name_offset, name_length, first, count in self._records("profiles", PROFILE):
+            self.profiles[self._str(name_offset, name_length)] = (first, count)
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+
+    def verify(self):
+        if hashlib.sha256(self._view[HEADER.size:]).digest() != self._body_digest:
+            raise SnapshotError(f"{self.path}: body does not match its digest")
+
+    def _offset(self, section: str, struct_: struct.Struct, index: int) -> int:
+        return self._sections[section][0] + index * struct_.size
+
+    def _records(self, section: str, struct_: struct.Struct, first: int = 0, count: Optional[int] = None):
+        if count is None:
+            count = self._sections[section][1] - first
+        for index in range(first, first + count):
+            yield (index, *struct_.unpack_from(self._mm, self._offset(section, struct_, index)))
+
+    def _str(self, offset: int, length: int) -> Optional[str]:
+        if length == NULL:
+            return None
+        start = self._strings + offset
+        return str(self._view[start:start + length], "utf-8")
+
+    def _question(self, index: int) -> QuestionRecord:
+        fields = QUESTION.unpack_from(self._mm, self._offset("questions", QUESTION, index))
+        texts = [self._str(fields[i], fields[i + 1]) for i in range(1, 15, 2)]
+        question, image_url, answer_a, answer_b, answer_c, answer_d, explanation = texts
+        return QuestionRecord(
+            fields[0], question, image_url, answer_a, answer_b, answer_c, answer_d, chr(fields[15]), explanation
+        )
+
+    def _question_category(self, index: int) -> str:
+        for code, (first, count) in self.categories.items():
+            if first <= index < first + count:
+                return code
+        raise SnapshotError(f"question {index} has no category")
+
+    def category_records(self, category: str) -> Tuple[QuestionRecord, ...]:
+        first, count = self.categories.get(category, (0, 0))
+        return tuple(self._question(index) for index in range(first, first + count))
+
+    def totals(self) -> Dict[Tuple[str, str], int]:
+        totals = {("questions", code): count for code, (_, count) in self.categories.items()}
+        totals.update({("practice", profile): count for profile, (_, count) in self.profiles.items()})
+        return totals
+
+    def _term(self, index: int) -> str:
+        offset, length, _, _ = TERM.unpack_from(self._mm, self._offset("terms", TERM, index))
+        return self._str(offset, length)
+
+    def _postings_for_prefix(self, prefix: str) -> Dict[int, float]:
+        lo, hi = 0, self._term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        # Weighted occurrences of any term starting with the prefix.
+        matches: Dict[int, float] = {}
+        for index in range(lo, self._term_count):
+            offset, length, first, count = TERM.unpack_from(self._mm, self._offset("terms", TERM, index))
+            if not self._str(offset, length).startswith(prefix):
+                break
+            for _, question, in_question, in_answers in self._records("postings", POSTING, first, count):
+                weight = QUESTION_WEIGHT * in_question + ANSWER_WEIGHT * in_answers
+                matches[question] = matches.get(question, 0.0) + weight
+        return matches
+
+    def _question_tokens(self, index: int) -> int:
+        return QUESTION.unpack_from(self._mm, self._offset("questions", QUESTION, index))[16]
+
+    def search_questions(self, categories: List[str], query: str, per_category: int = 5, limit: int = 50) -> List[SearchHit]:
+        tokens = tokenize_query(query)
+        if not tokens:
+            return []
+
+        # Every token must prefix-match a word of the question or its
+        # answers, like the FTS index's "token"* queries.
+        matches = [self._postings_for_prefix(token) for token in tokens]
+        candidates = set(matches[0]).intersection(*matches[1:])
+        if not candidates:
+            return []
+
+        scores: Dict[int, float] = {}
+        for question in candidates:
+            length_norm = 1 - BM25_B + BM25_B * self._question_tokens(question) / self._average_tokens
+            score = 0.0
+            for postings in matches:
+                idf = math.log((self._question_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                weight = postings[question]
+                score += max(idf, 1e-6) * weight * (BM25_K1 + 1) / (weight + BM25_K1 * length_norm)
+            scores[question] = score
+
+        # Questions are stored by (category, id), so ties fall back to the
+        # same order as the database query's.
+        allowed = set(categories)
+        ranked = []
+        for question, score in scores.items():
+            category = self._question_category(question)
+            if category in allowed:
+                ranked.append((-score, question, category))
+        ranked.sort()
+
+        hits = []
+        per_group: Dict[str, int] = {}
+        for negative_score, question, category in ranked:
+            if per_group.get(category, 0) >= per_category:
+                continue
+            per_group[category] = per_group.get(category, 0) + 1
+            record = self._question(question)
+            hits.append(SearchHit(category, record.id, record.question, negative_score))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def _archive(self, profile: str, index: int, columns: Iterable[str], kinds=None, with_files: bool = True) -> dict:
+        (archive_id, code_offset, code_length, date_offset, date_length, year,
+         type_offset, type_length, downloaded, first_file, file_count) = ARCHIVE.unpack_from(
+            self._mm, self._offset("archives", ARCHIVE, index)
+        )
+        archive = {"profile": profile, "id": archive_id, "year": year, "date": self._str(date_offset, date_length)}
+        values = {
+            "code": lambda: self._str(code_offset, code_length),
+            "type": lambda: self._str(type_offset, type_length),
+            "downloaded": lambda: downloaded,
+        }
+        for column in columns:
+            archive[column] = values[column]()
+
+        files = {}
+        if with_files:
+            for _, kind_offset, kind_length, url_offset, url_length in self._records("files", FILE, first_file, file_count):
+                kind = self._str(kind_offset, kind_length)
+                if kinds is None or kind in kinds:
+                    files[kind] = self._str(url_offset, url_length)
+        archive["files"] = files
+        return archive
+
+    def archives(self, profile: str, archive_id: Optional[int] = None, after: Optional[tuple] = None,
+                 columns=("code", "type", "downloaded"), kinds=None, with_files: bool = True,
+                 limit: Optional[int] = None) -> List[dict]:
+        # Archives are stored in serving order (year desc, date desc, id), so
+        # a keyset page is a scan from the first row past the cursor.
+        first, count = self.profiles.get(profile, (0, 0))
+        result = []
+        for index in range(first, first + count):
+            current_id, _, _, date_offset, date_length, year = ARCHIVE.unpack_from(
+                self._mm, self._offset("archives", ARCHIVE, index)
+            )[:6]
+            if archive_id is not None and current_id != archive_id:
+                continue
+            if after is not None:
+                after_year, after_date, after_id = after
+                date = self._str(date_offset, date_length)
+                if (year, date) == (after_year, after_date):
+                    if current_id <= after_id:
+                        continue
+                elif year > after_year or (year == after_year and date > after_date):
+                    continue
+            result.append(self._archive(profile, index, columns, kinds, with_files))
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def archive_ids(self, profile: str) -> List[int]:
+        first, count = self.profiles.get(profile, (0, 0))
+        return [record[1] for record in self._records("archives", ARCHIVE, first, count)]
+
+    def download_totals(self) -> Dict[str, int]:
+        totals = {}
+        for profile, (first, count) in self.profiles.items():
+            totals[profile] = sum(record[9] for record in self._records("archives", ARCHIVE, first, count))
+        return totals
+
+    def search_archives(self, profiles: List[str], query: str, per_profile: int = 5) -> List[ArchiveHit]:
+        query = query.lower()
+        hits = []
+        for profile in profiles:
+            first, count = self.profiles.get(profile, (0, 0))
+            matched = []
+            for record in self._records("archives", ARCHIVE, first, count):
+                archive_id, code = record[1], self._str(record[2], record[3])
+                date = self._str(record[4], record[5])
+                if query in code.lower() or query in date.lower():
+                    matched.append(ArchiveHit(profile, archive_id, code, date))
+            hits.extend(sorted(matched, key=lambda hit: hit.archive_id)[:per_profile])
+        return hits
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "digest": self.digest[:16],
+            "built_at": self.built_at,
+            "bytes": len(self._mm),
+            "questions": self._sections["questions"][1],
+            "archives": self._sections["archives"][1],
+            "terms": self._term_count,
+        }
+
+
+class SnapshotRunner:
+    # Stands in for the database runner. Snapshot reads are CPU-bound, so a
+    # worker thread would only add queueing under the GIL; the function runs
+    # inline and gets no session.
+    async def run(self, fn, *args):
+        return fn(None, *args)
+
+
+def load_snapshot(path: Optional[str]) -> Optional[Snapshot]:
+    if not path:
+        return None
+    try:
+        return Snapshot(Path(path))
+    except (OSError, SnapshotError, struct.error) as e:
+        print(f"⚠️ Warning: data snapshot unavailable ({e}), serving from the database")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WEB3Informatyk data snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    builder = commands.add_parser("build", help="compile the questions and practice tables into a snapshot")
+    builder.add_argument("-o", "--output", type=Path, default=Path("data.snapshot"))
+    inspector = commands.add_parser("info", help="print a snapshot's header")
+    inspector.add_argument("path", type=Path, nargs="?", default=Path("data.snapshot"))
+    inspector.add_argument("--verify", action="store_true", help="also check the body against its digest")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from database import engine
+
+        with engine.connect() as conn:
+            built = build_snapshot(conn, args.output)
+        print(
+            f"{args.output}: {built['questions']} questions in {built['categories']} categories, "
+            f"{built['archives']} archives in {built['profiles']} profiles, "
+            f"{built['terms']} search terms, {built['bytes'] / 1024:.0f} KiB"
+        )
+    else:
+        snapshot = Snapshot(args.path)
+        if args.verify:
+            snapshot.verify()
+        for key, value in snapshot.stats().items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
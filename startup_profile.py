@@ -0,0 +1,61 @@
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def run_importtime(module: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(result.returncode)
+    return result.stderr
+
+
+def parse_importtime(output: str):
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def summarize(entries, top: int):
+    # Attribute every module's own time to its top-level package so e.g.
+    # sqlalchemy.orm.* and sqlalchemy.sql.* are reported together.
+    packages = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        packages[name.split(".")[0]] += self_us
+
+    total_us = sum(packages.values())
+    print(f"Total import time: {total_us / 1000:.1f} ms ({len(entries)} modules)\n")
+
+    print("By top-level package (self time):")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {package}")
+
+    print("\nSlowest direct imports (cumulative):")
+    roots = [entry for entry in entries if entry[3] <= 1]
+    for name, _, cumulative_us, _ in sorted(roots, key=lambda entry: -entry[2])[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-module import time breakdown")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    summarize(parse_importtime(run_importtime(args.module)), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from typing import List, NamedTuple, Optional
+
+TOKEN_VERSION = 1
+MAC_SIZE = 16
+LETTERS = "abcd"
+HEADER = struct.Struct("<BIH")
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class TestKey(NamedTuple):
+    category: str
+    issued_at: int
+    question_ids: List[int]
+    answers: str
+
+    def answer_map(self) -> dict:
+        return dict(zip(self.question_ids, self.answers))
+
+
+def pack_answers(answers: str) -> bytes:
+    packed = bytearray((len(answers) + 3) // 4)
+    for i, letter in enumerate(answers):
+        packed[i // 4] |= LETTERS.index(letter) << (2 * (i % 4))
+    return bytes(packed)
+
+
+def unpack_answers(packed: bytes, count: int) -> str:
+    return "".join(
+        LETTERS[(packed[i // 4] >> (2 * (i % 4))) & 0b11]
+        for i in range(count)
+    )
+
+
+class TestTokenSigner:
+    def __init__(self, secret: bytes, max_age: Optional[int] = None):
+        self.secret = secret
+        self.max_age = max_age
+
+    def _mac(self, payload: bytes) -> bytes:
+        return hmac.new(self.secret, payload, hashlib.sha256).digest()[:MAC_SIZE]
+
+    def issue(self, category: str, question_ids: List[int], answers: str) -> str:
+        encoded_category = category.encode("utf-8")
+        payload = b"".join([
+            HEADER.pack(TOKEN_VERSION, int(time.time()), len(question_ids)),
+            bytes([len(encoded_category)]),
+            encoded_category,
+            struct.pack(f"<{len(question_ids)}I", *question_ids),
+            pack_answers(answers),
+        ])
+        return base64.urlsafe_b64encode(payload + self._mac(payload)).rstrip(b"=").decode("ascii")
+
+    def verify(self, token: str) -> TestKey:
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (ValueError, TypeError):
+            raise InvalidToken("malformed token")
+
+        payload, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if len(raw) <= MAC_SIZE or not hmac.compare_digest(mac, self._mac(payload)):
+            raise InvalidToken("bad signature")
+
+        version, issued_at, count = HEADER.unpack_from(payload)
+        if version != TOKEN_VERSION:
+            raise InvalidToken("unsupported token version")
+        if self.max_age and time.time() - issued_at > self.max_age:
+            raise InvalidToken("token expired")
+
+        offset = HEADER.size
+        category_size = payload[offset]
+        offset += 1
+        category = payload[offset:offset + category_size].decode("utf-8")
+        offset += category_size
+        question_ids = list(struct.unpack_from(f"<{count}I", payload, offset))
+        offset += 4 * count
+        answers = unpack_answers(payload[offset:], count)
+
+        return TestKey(category, issued_at, question_ids, answers)
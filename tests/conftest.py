@@ -0,0 +1,64 @@
+import os
+import tempfile
+import threading
+
+# database.py builds its engine at import time; the tests use their own.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'web3informatyk-tests.db')}")
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from database import Base
+import models  # noqa: F401  (registers the tables on Base)
+
+TIMEOUT = 10
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+class PausedFlush:
+    # Holds a flush inside its transaction, right after the first statement
+    # containing `fragment` has run, until release() is called.
+    def __init__(self, engine, fragment: str):
+        self.reached = threading.Event()
+        self.released = threading.Event()
+        self._engine = engine
+        self._fragment = fragment
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._fragment in statement and not self.reached.is_set():
+            self.reached.set()
+            assert self.released.wait(TIMEOUT), "flush was never released"
+
+    def start(self, flush) -> threading.Thread:
+        thread = threading.Thread(target=flush, daemon=True)
+        thread.start()
+        assert self.reached.wait(TIMEOUT), "flush never reached the paused statement"
+        return thread
+
+    def release(self, thread: threading.Thread):
+        self.released.set()
+        thread.join(TIMEOUT)
+        assert not thread.is_alive(), "flush did not finish"
+        event.remove(self._engine, "after_cursor_execute", self._after_execute)
+
+
+def run_with_timeout(fn, *args):
+    # Runs fn in a thread and fails instead of hanging if it blocks.
+    result = {}
+
+    def target():
+        result["value"] = fn(*args)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), f"{getattr(fn, '__name__', fn)} blocked behind the flush"
+    return result["value"]
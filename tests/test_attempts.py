@@ -0,0 +1,101 @@
+from sqlalchemy.orm import Session
+
+from attempts import AttemptRecorder
+from conftest import PausedFlush, run_with_timeout
+
+ANSWER_KEY = {1: "a", 2: "b", 3: "c"}
+
+
+def record(recorder, user_id="user-1", answers=None):
+    return recorder.record(user_id, "INF.02", "inf02-40", answers or {1: "a", 2: "a", 3: "c"}, ANSWER_KEY)
+
+
+def progress(engine, recorder, user_id="user-1"):
+    with Session(engine) as db:
+        return recorder.user_progress(db, user_id)
+
+
+def question_stats(engine, recorder):
+    with Session(engine) as db:
+        return recorder.question_stats(db, "INF.02")
+
+
+def test_progress_counts_pending_attempts(engine):
+    recorder = AttemptRecorder(engine)
+    record(recorder)
+    record(recorder, answers={1: "a", 2: "b"})
+
+    assert progress(engine, recorder) == {"INF.02": [2, 5, 4]}
+    assert question_stats(engine, recorder) == ({}, 0)
+
+
+def test_progress_is_exact_after_flush(engine):
+    recorder = AttemptRecorder(engine)
+    record(recorder)
+    assert recorder.flush() == 1
+    record(recorder, answers={1: "a", 2: "b"})
+
+    assert progress(engine, recorder) == {"INF.02": [2, 5, 4]}
+    assert question_stats(engine, recorder) == ({1: (1, 1), 2: (1, 0), 3: (1, 1)}, 1)
+
+
+def test_progress_is_exact_while_a_flush_is_in_flight(engine):
+    recorder = AttemptRecorder(engine)
+    record(recorder)
+    recorder.flush()
+    record(recorder, answers={1: "a", 2: "b"})
+
+    # Paused after its attempts and stats are written, before the commit.
+    paused = PausedFlush(engine, "user_category_stats")
+    flush = paused.start(recorder.flush)
+    record(recorder, answers={3: "d"})
+    try:
+        during = run_with_timeout(progress, engine, recorder)
+        stats_during = run_with_timeout(question_stats, engine, recorder)
+    finally:
+        paused.release(flush)
+
+    assert during == {"INF.02": [3, 6, 4]}
+    # The uncommitted batch is not in the rows yet, and the flush count
+    # says so; the listeners get it with the next one.
+    assert stats_during == ({1: (1, 1), 2: (1, 0), 3: (1, 1)}, 1)
+    assert progress(engine, recorder) == {"INF.02": [3, 6, 4]}
+    assert question_stats(engine, recorder) == ({1: (2, 2), 2: (2, 1), 3: (1, 1)}, 2)
+
+
+def test_listeners_get_each_committed_batch_once(engine):
+    recorder = AttemptRecorder(engine)
+    applied = []
+    recorder.listeners.append(lambda stats, flushes: applied.append((dict(stats), flushes)))
+    record(recorder)
+    recorder.flush()
+    recorder.flush()
+
+    assert applied == [({("INF.02", 1): [1, 1], ("INF.02", 2): [1, 0], ("INF.02", 3): [1, 1]}, 1)]
+
+
+def test_recording_does_not_wait_for_a_flush(engine):
+    recorder = AttemptRecorder(engine)
+    record(recorder)
+    paused = PausedFlush(engine, "INSERT INTO attempts")
+    flush = paused.start(recorder.flush)
+    try:
+        attempt_id = run_with_timeout(record, recorder)
+    finally:
+        paused.release(flush)
+
+    assert attempt_id is not None
+    assert recorder.stats()["pending"] == 1
+    assert progress(engine, recorder) == {"INF.02": [2, 6, 4]}
+
+
+def test_failed_flush_keeps_the_batch(engine):
+    recorder = AttemptRecorder(engine)
+    record(recorder)
+    engine.dispose()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE attempt_answers")
+
+    assert recorder.flush() == 0
+    assert recorder.stats()["pending"] == 1
+    assert progress(engine, recorder) == {"INF.02": [1, 3, 2]}
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from difficulty import BUILD_ATTEMPTS, DifficultyIndex, error_weight
+from sampler import QuestionFragment
+
+
+def make_bank(*ids):
+    return SimpleNamespace(fragments=[QuestionFragment(i, f"q{i}", None, "", ("a", "b", "c", "d"), 0) for i in ids])
+
+
+class Rows:
+    # Stands in for the attempts tables: question_stats() reads them, and
+    # flush() commits a batch and calls the listeners like AttemptRecorder.
+    def __init__(self, index=None):
+        self.stats = {}
+        self.flushes = 0
+        self.index = index
+        self.during_read = []
+
+    def flush(self, batch):
+        for question_id, (answered, correct) in batch.items():
+            stats = self.stats.get(question_id, (0, 0))
+            self.stats[question_id] = (stats[0] + answered, stats[1] + correct)
+        self.flushes += 1
+        self.index.apply({("INF.02", question_id): list(counts) for question_id, counts in batch.items()}, self.flushes)
+
+    def question_stats(self, db, category):
+        rows, flushes = dict(self.stats), self.flushes
+        # A batch queued here commits after the read, before get() caches.
+        if self.during_read:
+            self.flush(self.during_read.pop(0))
+        return rows, flushes
+
+
+def weights(entry):
+    return entry.tree.weights
+
+
+def test_flushed_batches_update_the_cached_weights():
+    rows = Rows()
+    index = rows.index = DifficultyIndex(rows.question_stats)
+    bank = make_bank(1, 2)
+    entry = index.get(None, "INF.02", bank)
+
+    rows.flush({1: (3, 0)})
+
+    assert index.get(None, "INF.02", bank) is entry
+    assert weights(entry) == [error_weight(3, 0), error_weight(0, 0)]
+
+
+def test_batch_flushed_during_a_build_is_not_missed():
+    rows = Rows()
+    index = rows.index = DifficultyIndex(rows.question_stats)
+    bank = make_bank(1, 2)
+    rows.during_read.append({1: (2, 0)})
+
+    entry = index.get(None, "INF.02", bank)
+
+    assert weights(entry) == [error_weight(2, 0), error_weight(0, 0)]
+    assert entry.generation == 1
+    assert index.stats()["rebuilds"] == 1
+    # Later batches still update the rebuilt entry.
+    rows.flush({2: (1, 1)})
+    assert weights(index.get(None, "INF.02", bank)) == [error_weight(2, 0), error_weight(1, 1)]
+
+
+def test_build_racing_every_flush_is_not_cached():
+    rows = Rows()
+    index = rows.index = DifficultyIndex(rows.question_stats)
+    bank = make_bank(1)
+    rows.during_read.extend({1: (1, 0)} for _ in range(BUILD_ATTEMPTS))
+
+    index.get(None, "INF.02", bank)
+
+    assert index.stats()["categories"] == {}
+    assert weights(index.get(None, "INF.02", bank)) == [error_weight(BUILD_ATTEMPTS, 0)]
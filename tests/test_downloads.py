@@ -0,0 +1,112 @@
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from conftest import PausedFlush, run_with_timeout
+from downloads import DownloadCounters
+from models import PracticeArchive
+
+
+def add_archives(engine, *keys, downloaded=0):
+    with engine.begin() as conn:
+        conn.execute(insert(PracticeArchive), [
+            {"profile": profile, "id": archive_id, "code": f"{profile}-{archive_id}", "date": "2024-06",
+             "year": 2024, "downloaded": downloaded}
+            for profile, archive_id in keys
+        ])
+
+
+def archive_downloads(engine, counters, profile, archive_id):
+    # The stored column is read the way the API does, then combined.
+    with Session(engine) as db:
+        stored = db.execute(
+            select(PracticeArchive.downloaded)
+            .where(PracticeArchive.profile == profile, PracticeArchive.id == archive_id)
+        ).scalar()
+    return counters.archive_downloads(profile, archive_id, stored)
+
+
+def profile_totals(engine, counters):
+    with Session(engine) as db:
+        return counters.profile_totals(db)
+
+
+def test_counts_are_exact_before_and_after_a_flush(engine):
+    add_archives(engine, ("inf02", 1), ("inf02", 2), ("e12", 1), downloaded=5)
+    counters = DownloadCounters(engine, shards=4)
+    assert profile_totals(engine, counters) == {"inf02": 10, "e12": 5}
+
+    for _ in range(3):
+        counters.record("inf02", 1)
+    counters.record("e12", 1)
+    assert archive_downloads(engine, counters, "inf02", 1) == 8
+    assert profile_totals(engine, counters) == {"inf02": 13, "e12": 6}
+
+    assert counters.flush() == 2
+    assert archive_downloads(engine, counters, "inf02", 1) == 8
+    assert archive_downloads(engine, counters, "inf02", 2) == 5
+    assert profile_totals(engine, counters) == {"inf02": 13, "e12": 6}
+
+
+def test_counts_do_not_dip_while_a_flush_is_in_flight(engine):
+    add_archives(engine, ("inf02", 1), ("inf02", 2))
+    counters = DownloadCounters(engine)
+    counters.record("inf02", 1)
+    counters.record("inf02", 1)
+
+    paused = PausedFlush(engine, "UPDATE practice_archives")
+    flush = paused.start(counters.flush)
+    counters.record("inf02", 1)
+    try:
+        archive_during = run_with_timeout(archive_downloads, engine, counters, "inf02", 1)
+        totals_during = run_with_timeout(profile_totals, engine, counters)
+    finally:
+        paused.release(flush)
+
+    assert archive_during == 3
+    assert totals_during == {"inf02": 3}
+    assert archive_downloads(engine, counters, "inf02", 1) == 3
+    assert profile_totals(engine, counters) == {"inf02": 3}
+    # The load that overlapped the flush is redone once it has committed.
+    assert counters.stats()["retried_loads"] == 1
+
+
+def test_totals_loaded_before_a_flush_stay_exact(engine):
+    add_archives(engine, ("inf02", 1))
+    counters = DownloadCounters(engine)
+    assert profile_totals(engine, counters) == {"inf02": 0}
+    counters.record("inf02", 1)
+
+    paused = PausedFlush(engine, "UPDATE practice_archives")
+    flush = paused.start(counters.flush)
+    try:
+        during = run_with_timeout(profile_totals, engine, counters)
+    finally:
+        paused.release(flush)
+
+    assert during == {"inf02": 1}
+    assert profile_totals(engine, counters) == {"inf02": 1}
+
+
+def test_failed_flush_puts_the_counts_back(engine):
+    add_archives(engine, ("inf02", 1))
+    counters = DownloadCounters(engine)
+    counters.record("inf02", 1)
+    engine.dispose()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE practice_archives RENAME TO practice_archives_moved")
+
+    assert counters.flush() == 0
+    assert counters.stats()["pending"] == 1
+    assert counters.archive_downloads("inf02", 1, 0) == 1
+
+
+def test_snapshot_totals_add_this_process_flushes(engine):
+    add_archives(engine, ("inf02", 1))
+    counters = DownloadCounters(engine, totals_source=lambda: {"inf02": 7})
+    counters.record("inf02", 1)
+    counters.flush()
+    counters.record("inf02", 1)
+
+    # The snapshot's stored column (7) is frozen; both downloads are added.
+    assert counters.archive_downloads("inf02", 1, 7) == 9
+    assert profile_totals(engine, counters) == {"inf02": 9}
@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import instrumentation
+from instrumentation import RequestMetrics, current_metrics
+
+
+@pytest.fixture
+def metrics():
+    metrics = RequestMetrics()
+    token = current_metrics.set(metrics)
+    yield metrics
+    current_metrics.reset(token)
+
+
+def test_failed_statements_leave_no_timing_state(metrics):
+    engine = create_engine("sqlite://")
+    instrumentation.instrument_engine(engine)
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+        assert not conn.info.get("query_started")
+    # Only statements that ran are counted.
+    assert metrics.statements == 1
+    assert 0 <= metrics.db_seconds < 1
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, select
+
+from pagination import InvalidCursor, after_cursor, decode_cursor, encode_cursor
+
+metadata = MetaData()
+archives = Table(
+    "archives", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("year", Integer, nullable=False),
+    Column("date", String, nullable=False),
+)
+ORDER = ((archives.c.year, True), (archives.c.date, True), (archives.c.id, False))
+TYPES = (int, str, int)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    rng = random.Random(7)
+    # Few distinct years and dates, so most rows tie on both.
+    rows = [
+        {"id": archive_id, "year": rng.choice([2022, 2023, 2024]), "date": rng.choice(["2024-01", "2024-06", "zima"])}
+        for archive_id in rng.sample(range(1, 1000), 60)
+    ]
+    with engine.connect() as conn:
+        conn.execute(insert(archives), rows)
+        yield conn
+
+
+def ordered(query):
+    return query.order_by(*(column.desc() if descending else column for column, descending in ORDER))
+
+
+def page(conn, cursor, limit):
+    query = select(archives.c.year, archives.c.date, archives.c.id)
+    if cursor is not None:
+        query = query.where(after_cursor(ORDER, decode_cursor(cursor, TYPES)))
+    return [tuple(row) for row in conn.execute(ordered(query).limit(limit))]
+
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 60, 100])
+def test_pages_cover_every_row_once_in_order(conn, limit):
+    expected = [tuple(row) for row in conn.execute(ordered(select(archives.c.year, archives.c.date, archives.c.id)))]
+    seen, cursor = [], None
+    # Bounded, so a cursor that stops advancing fails instead of looping.
+    for _ in range(len(expected) + 1):
+        rows = page(conn, cursor, limit)
+        seen.extend(rows)
+        if len(rows) < limit:
+            break
+        cursor = encode_cursor(*rows[-1])
+
+    assert seen == expected
+
+
+def test_cursor_after_a_tie_skips_only_earlier_ids(conn):
+    rows = page(conn, None, 60)
+    year, date, _ = rows[0]
+    tied = [row for row in rows if (row[0], row[1]) == (year, date)]
+    assert len(tied) > 2
+
+    after = page(conn, encode_cursor(*tied[0]), 60)
+
+    assert after[:len(tied) - 1] == tied[1:]
+
+
+@pytest.mark.parametrize("values", [(2024, "2024-06", 17), (0, "", 0), (2023, "zażółć", 2**31)])
+def test_cursor_round_trip(values):
+    assert decode_cursor(encode_cursor(*values), TYPES) == values
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "not base64!", encode_cursor(2024, "2024-06"), encode_cursor("2024", "2024-06", 1),
+    encode_cursor(2024, None, 1), "eyJhIjoxfQ",
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, TYPES)
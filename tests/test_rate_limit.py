@@ -0,0 +1,31 @@
+from starlette.requests import Request
+
+import rate_limit
+from rate_limit import Limiter, MemoryStorage, RateLimit, client_address
+
+
+def request(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": (peer, 443)})
+
+
+def test_clients_behind_the_proxy_get_their_own_buckets():
+    # One proxy by default: its peer address is shared by every client.
+    limiter = Limiter(MemoryStorage())
+    limit = RateLimit("2/minute")
+
+    for client in ("203.0.113.5", "198.51.100.7"):
+        assert limiter.check(request(client), "scope", limit) is None
+        assert limiter.check(request(client), "scope", limit) is None
+    assert limiter.check(request("203.0.113.5"), "scope", limit).status_code == 429
+
+
+def test_forged_addresses_before_the_proxy_are_ignored():
+    assert client_address(request("1.2.3.4, 203.0.113.5")) == "203.0.113.5"
+    assert client_address(request()) == "10.0.0.1"
+
+
+def test_direct_clients_use_the_peer_address(monkeypatch):
+    monkeypatch.setattr(rate_limit, "PROXY_HOPS", 0)
+
+    assert client_address(request("203.0.113.5")) == "10.0.0.1"
@@ -0,0 +1,88 @@
+import random
+from collections import Counter
+
+import pytest
+
+from sampler import FenwickTree, draw, draw_weighted
+
+SEEDS = range(4000)
+
+
+def linear_find(weights, target):
+    for index, weight in enumerate(weights):
+        if target < weight:
+            return index
+        target -= weight
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 8, 33])
+def test_find_matches_a_linear_scan(size):
+    rng = random.Random(size)
+    weights = [rng.randrange(0, 10) for _ in range(size)]
+    weights[0] += 1
+    tree = FenwickTree(weights)
+
+    for target in range(tree.total):
+        assert tree.find(target) == linear_find(weights, target)
+
+
+def test_updates_keep_prefix_sums():
+    tree = FenwickTree([3, 1, 4, 1, 5])
+    tree.set(2, 0)
+    tree.add(4, 2)
+
+    assert tree.weights == [3, 1, 0, 1, 7]
+    assert tree.total == 12
+    assert [tree.find(target) for target in range(tree.total)] == [0, 0, 0, 1, 3] + [4] * 7
+
+
+def test_draw_is_without_replacement_and_restores_the_tree():
+    fragments = list(range(10))
+    weights = [5, 0, 3, 0, 1, 2, 9, 0, 4, 6]
+    tree = FenwickTree(weights)
+
+    for seed in range(200):
+        drawn = [fragment for fragment, _ in draw_weighted(fragments, tree, 5, seed)]
+        assert len(set(drawn)) == 5
+        assert not {1, 3, 7} & set(drawn)
+    assert tree.weights == weights
+    assert tree.total == sum(weights)
+
+
+def test_draw_stops_at_the_weighted_questions():
+    tree = FenwickTree([0, 2, 0, 1])
+
+    assert sorted(fragment for fragment, _ in draw_weighted("abcd", tree, 4, 1)) == ["b", "d"]
+
+
+def test_equal_weights_draw_like_the_uniform_sampler():
+    fragments = list(range(20))
+    tree = FenwickTree([7] * len(fragments))
+    weighted, uniform = Counter(), Counter()
+    weighted_orders, uniform_orders = Counter(), Counter()
+
+    for seed in SEEDS:
+        for fragment, order in draw_weighted(fragments, tree, 5, seed):
+            weighted[fragment] += 1
+            weighted_orders[order] += 1
+        for fragment, order in draw(fragments, 5, seed):
+            uniform[fragment] += 1
+            uniform_orders[order] += 1
+
+    # Every question is drawn 4000 * 5 / 20 = 1000 times on average by
+    # both; a 15% band is over 5 standard deviations.
+    expected = len(SEEDS) * 5 / len(fragments)
+    for fragment in fragments:
+        assert abs(weighted[fragment] - expected) < 0.15 * expected
+        assert abs(uniform[fragment] - expected) < 0.15 * expected
+    # Answer orders are drawn the same way by both.
+    expected_order = len(SEEDS) * 5 / 24
+    for order in range(24):
+        assert abs(weighted_orders[order] - expected_order) < 0.25 * expected_order
+        assert abs(uniform_orders[order] - expected_order) < 0.25 * expected_order
+
+
+def test_same_seed_same_draw():
+    tree = FenwickTree([1, 2, 3, 4, 5, 6])
+
+    assert draw_weighted("abcdef", tree, 3, 42) == draw_weighted("abcdef", tree, 3, 42)
@@ -0,0 +1,80 @@
+import base64
+
+import pytest
+
+import test_token
+from test_token import HEADER, InvalidToken
+
+# Aliased so pytest does not collect it as a test class.
+Signer = test_token.TestTokenSigner
+
+
+def decode(token: str) -> bytes:
+    return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+
+
+def encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def test_round_trip():
+    signer = Signer(b"secret", max_age=60)
+    key = signer.verify(signer.issue("INF.02", [5, 17, 300000], "dab"))
+
+    assert key.category == "INF.02"
+    assert key.question_ids == [5, 17, 300000]
+    assert key.answer_map() == {5: "d", 17: "a", 300000: "b"}
+
+
+@pytest.mark.parametrize("position", [0, HEADER.size, -test_token.MAC_SIZE - 1, -1])
+def test_tampered_token_is_rejected(position):
+    signer = Signer(b"secret")
+    raw = bytearray(decode(signer.issue("INF.02", [1, 2], "ab")))
+    raw[position] ^= 0x01
+
+    with pytest.raises(InvalidToken):
+        signer.verify(encode(bytes(raw)))
+
+
+def test_other_secret_is_rejected():
+    token = Signer(b"secret").issue("INF.02", [1], "a")
+
+    with pytest.raises(InvalidToken, match="bad signature"):
+        Signer(b"other").verify(token)
+
+
+@pytest.mark.parametrize("token", ["", "abc", "!!!!", encode(b"\x00" * 4)])
+def test_malformed_token_is_rejected(token):
+    with pytest.raises(InvalidToken):
+        Signer(b"secret").verify(token)
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    signer = Signer(b"secret", max_age=60)
+    monkeypatch.setattr(test_token.time, "time", lambda: 1_000_000)
+    token = signer.issue("INF.02", [1], "a")
+
+    monkeypatch.setattr(test_token.time, "time", lambda: 1_000_060)
+    assert signer.verify(token).issued_at == 1_000_000
+    monkeypatch.setattr(test_token.time, "time", lambda: 1_000_061)
+    with pytest.raises(InvalidToken, match="expired"):
+        signer.verify(token)
+
+
+def test_wrong_version_is_rejected():
+    # Correctly signed, so only the version check can reject it.
+    signer = Signer(b"secret")
+    payload = decode(signer.issue("INF.02", [1], "a"))[:-test_token.MAC_SIZE]
+    _, issued_at, count = HEADER.unpack_from(payload)
+    payload = HEADER.pack(test_token.TOKEN_VERSION + 1, issued_at, count) + payload[HEADER.size:]
+
+    with pytest.raises(InvalidToken, match="version"):
+        signer.verify(encode(payload + signer._mac(payload)))
+
+
+def test_answers_pack_four_per_byte():
+    answers = "abcdabcda"
+    packed = test_token.pack_answers(answers)
+
+    assert len(packed) == 3
+    assert test_token.unpack_answers(packed, len(answers)) == answers
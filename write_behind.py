@@ -0,0 +1,48 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+
+class WriteBehind(ABC):
+    # Background flushing shared by the write-behind queues: flush() runs in
+    # the threadpool every flush_interval seconds, or as soon as wake() is
+    # called once enough has been queued, and once more on stop().
+    def __init__(self, flush_interval: float, enabled: bool = True):
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    def flush(self) -> int:
+        ...
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await run_in_threadpool(self.flush)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.flush)